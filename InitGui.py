@@ -64,6 +64,7 @@ class TrailsWorkbench(FreeCADGui.Workbench):
                 'cmd': ['Create Region',
                     'Create Sections',
                     'Compute Areas',
+                    'Compare Terrains',
                     'Create Table']},
 
             'Pad Tools': {
@@ -91,8 +92,12 @@ class TrailsWorkbench(FreeCADGui.Workbench):
                 'type': 'Trails::Terrain',
                 'cmd': ['Add Point',
                     'Delete Triangle',
+                    'Remove Triangles',
                     'Swap Edge',
-                    'Smooth Terrain']}
+                    'Undo Terrain Edit',
+                    'Redo Terrain Edit',
+                    'Smooth Terrain',
+                    'Decimate Terrain']}
         }
 
     def GetClassName(self):
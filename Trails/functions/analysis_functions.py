@@ -0,0 +1,124 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides array based surface analysis functions for Terrain objects."""
+
+import numpy
+import colorsys
+
+
+def facet_metrics(points, triangles):
+    """
+    Calculate centroid elevation, slope and direction (degrees)
+    of all facets. Returns a Mx3 array.
+    """
+    p1 = points[triangles[:, 0]]
+    p2 = points[triangles[:, 1]]
+    p3 = points[triangles[:, 2]]
+
+    normals = numpy.cross(p2 - p1, p3 - p1)
+    horizontal = numpy.hypot(normals[:, 0], normals[:, 1])
+
+    metrics = numpy.empty((len(triangles), 3), dtype=numpy.float64)
+    metrics[:, 0] = (p1[:, 2] + p2[:, 2] + p3[:, 2]) / 3
+    metrics[:, 1] = numpy.degrees(
+        numpy.arctan2(horizontal, numpy.abs(normals[:, 2])))
+    metrics[:, 2] = numpy.degrees(
+        numpy.arctan2(normals[:, 1], normals[:, 0])) % 360
+
+    return metrics
+
+def color_table(count, shift=1):
+    """
+    Create a lookup table of evenly spaced hues.
+    """
+    hues = (numpy.arange(count) + shift) / count
+    return numpy.array([colorsys.hls_to_rgb(h, 0.5, 0.5) for h in hues])
+
+def elevation_bins(metrics, ranges):
+    """
+    Bin facets by centroid elevation.
+    """
+    z = metrics[:, 0]
+    edges = numpy.linspace(z.min(), z.max(), ranges + 1)[1:-1]
+    return numpy.digitize(z, edges)
+
+def slope_bins(metrics, ranges):
+    """
+    Bin facets by slope, facets steeper than 45 degrees share last bin.
+    """
+    edges = numpy.linspace(0.0, 45.0, ranges + 1)[1:-1]
+    return numpy.digitize(metrics[:, 1], edges)
+
+def direction_bins(metrics, ranges):
+    """
+    Bin facets by direction, bins are centered on their start angle.
+    """
+    step = 360.0 / ranges
+    edges = numpy.arange(1, ranges) * step - step / 2
+    return numpy.digitize(metrics[:, 2], edges) % ranges
+
+
+class FacetAnalysis:
+    """
+    Keep facet metrics of a mesh to recolor it without
+    recalculating them.
+    """
+
+    def __init__(self):
+        self.metrics = None
+
+    def reset(self):
+        """
+        Forget cached metrics when mesh changes.
+        """
+        self.metrics = None
+
+    def update(self, points, triangles):
+        """
+        Calculate facet metrics if they aren't cached.
+        """
+        if self.metrics is None or len(self.metrics) != len(triangles):
+            self.metrics = facet_metrics(points, triangles)
+
+        return self.metrics
+
+    def colors(self, analysis_type, ranges):
+        """
+        Return a color for each facet by analysis type.
+        """
+        if self.metrics is None or len(self.metrics) == 0 or ranges < 1:
+            return numpy.zeros((0, 3))
+
+        if analysis_type == "Elevation":
+            bins = elevation_bins(self.metrics, ranges)
+            table = color_table(ranges)
+
+        elif analysis_type == "Slope":
+            bins = slope_bins(self.metrics, ranges)
+            table = color_table(ranges)
+
+        elif analysis_type == "Direction":
+            bins = direction_bins(self.metrics, ranges)
+            table = color_table(ranges, 0)
+
+        return table[bins]
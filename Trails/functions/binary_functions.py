@@ -0,0 +1,252 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides binary PLY and NumPy point file functions for Clusters."""
+
+import numpy
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "<i2", "int16": "<i2", "ushort": "<u2", "uint16": "<u2",
+    "int": "<i4", "int32": "<i4", "uint": "<u4", "uint32": "<u4",
+    "float": "<f4", "float32": "<f4", "double": "<f8", "float64": "<f8"}
+
+
+def encode_texts(texts):
+    """
+    Encode strings as PLY list records of uint length and bytes.
+    """
+    data = [i.encode("utf-8") for i in texts]
+    lengths = numpy.array([len(i) for i in data], dtype="<u4").tobytes()
+
+    return b"".join(b for i, text in enumerate(data)
+        for b in (lengths[4*i:4*i + 4], text))
+
+def decode_texts(buffer, start, count):
+    """
+    Decode PLY list records of uint length and bytes from buffer.
+    Returns strings and end position.
+    """
+    texts = []
+    for _ in range(count):
+        length = int.from_bytes(buffer[start:start + 4], "little")
+        texts.append(buffer[start + 4:start + 4 + length].decode("utf-8"))
+        start += 4 + length
+
+    return texts, start
+
+def read_ply_header(path):
+    """
+    Read elements of a binary little endian PLY header. Returns
+    header length and list of element name, count and properties.
+    """
+    elements = []
+    with open(path, 'rb') as file:
+        if file.readline().strip() != b"ply":
+            raise ValueError("{} is not a PLY file".format(path))
+
+        for line in file:
+            words = line.decode("ascii").split()
+            if not words or words[0] in ["comment", "obj_info"]: continue
+
+            if words[0] == "format" and words[1] != "binary_little_endian":
+                raise ValueError("Only binary little endian PLY files are supported")
+            elif words[0] == "element":
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == "property":
+                elements[-1][2].append(words[1:])
+            elif words[0] == "end_header":
+                return file.tell(), elements
+
+    raise ValueError("{} has no PLY header end".format(path))
+
+def element_size(buffer, offset, count, properties):
+    """
+    Get byte size of a PLY element. Rows with list properties are
+    sized by the list lengths of first row if all rows share them,
+    otherwise rows are walked.
+    """
+    fields, size = [], 0
+    for i in properties:
+        if i[0] != "list":
+            size += numpy.dtype(PLY_TYPES[i[0]]).itemsize
+            continue
+
+        length = numpy.dtype(PLY_TYPES[i[1]])
+        item = numpy.dtype(PLY_TYPES[i[2]]).itemsize
+        if offset + size + length.itemsize > len(buffer):
+            raise ValueError("PLY file is truncated")
+
+        first = int(numpy.ndarray((), dtype=length, buffer=buffer, offset=offset + size))
+        fields.append((size, length, first))
+        size += length.itemsize + first * item
+
+    if not fields or count == 0: return count * size
+
+    # List lengths of all rows are read with row stride
+    if offset + count * size <= len(buffer):
+        same = all((numpy.ndarray((count,), dtype=length, buffer=buffer,
+            offset=offset + start, strides=(size,)) == first).all()
+            for start, length, first in fields)
+        if same: return count * size
+
+    end = offset
+    for _ in range(count):
+        for i in properties:
+            if i[0] != "list":
+                end += numpy.dtype(PLY_TYPES[i[0]]).itemsize
+                continue
+
+            length = numpy.dtype(PLY_TYPES[i[1]])
+            if end + length.itemsize > len(buffer):
+                raise ValueError("PLY file is truncated")
+            number = int(numpy.ndarray((), dtype=length, buffer=buffer, offset=end))
+            end += length.itemsize + number * numpy.dtype(PLY_TYPES[i[2]]).itemsize
+
+    return end - offset
+
+def read_ply(path, chunk_size=1 << 22, progress=None):
+    """
+    Read vertices of a binary PLY file with memory mapping, name and
+    description elements are read as side columns. Yields names,
+    Nx3 coordinates in mm and descriptions. Progress is called with
+    read fraction of vertices.
+    """
+    offset, elements = read_ply_header(path)
+    buffer = numpy.memmap(path, dtype="u1", mode='r')
+
+    vertices, texts, data = None, {}, None
+    for index, (name, count, properties) in enumerate(elements):
+        # Elements after vertices and point columns are not needed
+        if vertices is not None and not any(i[0] in ["name", "description"]
+            for i in elements[index:]): break
+
+        if name in ["name", "description"]:
+            # Text records are decoded from bytes, slicing a map is slow
+            if data is None: data, base = buffer[offset:].tobytes(), offset
+            texts[name], end = decode_texts(data, offset - base, count)
+            offset = base + end
+
+        elif name == "vertex":
+            if any(i[0] == "list" for i in properties):
+                raise ValueError("PLY vertex list properties are not supported")
+
+            dtype = numpy.dtype([(i[1], PLY_TYPES[i[0]]) for i in properties])
+            vertices = numpy.ndarray(
+                (count,), dtype=dtype, buffer=buffer, offset=offset)
+            offset += count * dtype.itemsize
+
+        # Other elements like faces are skipped
+        else:
+            offset += element_size(buffer, offset, count, properties)
+
+    if vertices is None: return
+
+    count = len(vertices)
+    names = texts.get("name", [""] * count)
+    descriptions = texts.get("description", [""] * count)
+
+    for start in range(0, count, chunk_size):
+        block = vertices[start:start + chunk_size]
+        coords = numpy.column_stack((block["x"], block["y"], block["z"])) * 1000
+
+        end = start + len(block)
+        if progress: progress(end / count)
+        yield names[start:end], coords, descriptions[start:end]
+
+def write_ply(path, names, coords, descriptions):
+    """
+    Write points with coordinates in mm to a binary little endian PLY
+    file, names and descriptions are written as list elements.
+    """
+    count = len(coords)
+    header = "\n".join([
+        "ply", "format binary_little_endian 1.0",
+        "element vertex {}".format(count),
+        "property double x", "property double y", "property double z",
+        "element name {}".format(count), "property list uint uchar text",
+        "element description {}".format(count), "property list uint uchar text",
+        "end_header", ""])
+
+    with open(path, 'wb') as file:
+        file.write(header.encode("ascii"))
+        numpy.ascontiguousarray(coords / 1000, dtype="<f8").tofile(file)
+        file.write(encode_texts(names))
+        file.write(encode_texts(descriptions))
+
+def read_numpy(path, chunk_size=1 << 22, progress=None):
+    """
+    Read points of a .npy or .npz file. Arrays are Nx3 coordinates or
+    structured x, y, z fields, names and descriptions are read from
+    fields or npz arrays. Yields names, Nx3 coordinates in mm and
+    descriptions. Progress is called with read fraction of points.
+    """
+    if path.lower().endswith(".npz"):
+        with numpy.load(path) as data:
+            table = {key: data[key] for key in data.files}
+        points = table.get("points")
+    else:
+        points = numpy.load(path, mmap_mode='r')
+        table = {}
+
+    fields = points.dtype.names
+    if fields:
+        table.update({key: points[key] for key in ["name", "description"]
+            if key in fields})
+
+    count = len(points)
+    names = table.get("name", table.get("names", numpy.full(count, "")))
+    descriptions = table.get("description",
+        table.get("descriptions", numpy.full(count, "")))
+
+    # Mapped records are converted block by block
+    for start in range(0, count, chunk_size):
+        end = min(start + chunk_size, count)
+        block = points[start:end]
+        if fields:
+            coords = numpy.column_stack((block["x"], block["y"], block["z"])) * 1000
+        else:
+            coords = numpy.asarray(block[:, :3], dtype=numpy.float64) * 1000
+
+        if progress: progress(end / count)
+        yield names[start:end].tolist(), coords, descriptions[start:end].tolist()
+
+def write_numpy(path, names, coords, descriptions):
+    """
+    Write points with coordinates in mm to a .npz file of points, names
+    and descriptions arrays or to a .npy file of a structured array.
+    """
+    names = numpy.array(names, dtype=str).reshape(-1)
+    descriptions = numpy.array(descriptions, dtype=str).reshape(-1)
+
+    if path.lower().endswith(".npz"):
+        numpy.savez(path, points=coords / 1000,
+            names=names, descriptions=descriptions)
+        return
+
+    table = numpy.empty(len(coords), dtype=[
+        ("x", "<f8"), ("y", "<f8"), ("z", "<f8"),
+        ("name", names.dtype), ("description", descriptions.dtype)])
+    table["x"], table["y"], table["z"] = (coords / 1000).T
+    table["name"], table["description"] = names, descriptions
+
+    numpy.save(path, table)
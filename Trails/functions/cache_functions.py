@@ -0,0 +1,172 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides content addressed caches for derived shapes."""
+
+import numpy
+import hashlib, os, tempfile
+from collections import OrderedDict
+
+
+def array_key(*arrays):
+    """
+    Hash array contents with their types and shapes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = numpy.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(array.data)
+
+    return digest.hexdigest()
+
+def shape_key(name, mesh_key, *params):
+    """
+    Create cache key of a derived shape from mesh key and parameters.
+    """
+    return hashlib.blake2b(
+        repr((name, mesh_key) + params).encode(), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """
+    In-memory cache which drops least recently used entries.
+    """
+
+    def __init__(self, size=16):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """
+        Return cached value or None.
+        """
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+
+        return value
+
+    def put(self, key, value):
+        """
+        Add value and drop oldest entries above cache size.
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        self.entries.clear()
+
+
+class DiskCache:
+    """
+    Cache of polyline groups in a binary file. Each entry is a list
+    of groups and each group is a list of Nx3 coordinate arrays.
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self.path = None
+        self.stored = []
+        self.entries = OrderedDict()
+        self.changed = False
+
+    def open(self, path):
+        """
+        Read entry keys of a cache file, entries are read on demand.
+        """
+        self.path = path
+        self.entries.clear()
+        self.changed = False
+
+        with numpy.load(path) as data:
+            self.stored = data["keys"].tolist()
+        for key in self.stored:
+            self.entries[key] = None
+
+    def read(self, key):
+        """
+        Read an entry from cache file.
+        """
+        with numpy.load(self.path) as data:
+            coords = data[key + "_coords"]
+            sizes = data[key + "_sizes"]
+            groups = data[key + "_groups"]
+
+        lines = numpy.split(coords, numpy.cumsum(sizes)[:-1]) if len(sizes) else []
+        bounds = numpy.cumsum(groups) - groups
+
+        return [lines[i:i + count] for i, count in zip(bounds, groups)]
+
+    def get(self, key):
+        """
+        Return cached polyline groups or None.
+        """
+        if key not in self.entries:
+            return None
+
+        groups = self.entries[key]
+        if groups is None:
+            groups = self.read(key)
+
+        self.entries[key] = groups
+        self.entries.move_to_end(key)
+        return groups
+
+    def put(self, key, groups):
+        """
+        Add polyline groups and drop oldest entries above cache size.
+        """
+        self.entries[key] = groups
+        self.entries.move_to_end(key)
+        self.changed = True
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """
+        Write all entries to a temporary binary file and return its path.
+        """
+        data = {"keys": numpy.array(list(self.entries), dtype=str)}
+
+        for key, groups in self.entries.items():
+            if groups is None:
+                groups = self.read(key)
+            lines = [line for group in groups for line in group]
+
+            data[key + "_coords"] = numpy.vstack(lines) if lines else numpy.zeros((0, 3))
+            data[key + "_sizes"] = numpy.array([len(i) for i in lines], dtype=numpy.int64)
+            data[key + "_groups"] = numpy.array([len(i) for i in groups], dtype=numpy.int64)
+
+        handle, path = tempfile.mkstemp(suffix=".npz")
+        with os.fdopen(handle, "wb") as file:
+            numpy.savez(file, **data)
+
+        self.changed = False
+        return path
@@ -0,0 +1,74 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides surface to surface comparison of Terrain triangulations."""
+
+import numpy
+
+
+def compare_surfaces(base, comparison, bounds, spacing, rows=256):
+    """
+    Sample two triangle indexes at grid cell centers and integrate
+    their elevation difference. Grid rows are processed in blocks to bound
+    memory. Returns cut, fill and net volumes, difference points and
+    grid triangles of the isopach surface.
+    """
+    xmin, ymin, xmax, ymax = bounds
+    xs = numpy.arange(xmin + spacing / 2, xmax, spacing)
+    ys = numpy.arange(ymin + spacing / 2, ymax, spacing)
+    area = spacing * spacing
+
+    cut = fill = 0.0
+    valid = numpy.zeros((len(ys), len(xs)), dtype=bool)
+    blocks = []
+
+    for start in range(0, len(ys), rows):
+        gx, gy = numpy.meshgrid(xs, ys[start:start + rows])
+        xy = numpy.column_stack((gx.ravel(), gy.ravel()))
+
+        # Difference of surfaces, nan out of any of them
+        dz = comparison.elevations(xy) - base.elevations(xy)
+        hit = ~numpy.isnan(dz)
+
+        fill += dz[hit & (dz > 0)].sum() * area
+        cut -= dz[hit & (dz < 0)].sum() * area
+
+        valid[start:start + rows] = hit.reshape(gx.shape)
+        blocks.append(numpy.column_stack((xy[hit], dz[hit])))
+
+    points = numpy.vstack(blocks) if blocks else numpy.zeros((0, 3))
+
+    # Node numbers of valid grid nodes in row order
+    nodes = numpy.full(valid.shape, -1, dtype=numpy.int64)
+    nodes[valid] = numpy.arange(valid.sum())
+
+    # Two triangles for each cell with four valid corners
+    a, b = nodes[:-1, :-1], nodes[:-1, 1:]
+    c, d = nodes[1:, 1:], nodes[1:, :-1]
+    cells = (a >= 0) & (b >= 0) & (c >= 0) & (d >= 0)
+    a, b, c, d = a[cells], b[cells], c[cells], d[cells]
+
+    triangles = numpy.vstack((
+        numpy.column_stack((a, b, c)),
+        numpy.column_stack((a, c, d)))).astype(numpy.int32)
+
+    return cut, fill, fill - cut, points, triangles
@@ -0,0 +1,393 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides array based contour functions for Terrain triangulations."""
+
+import numpy
+import os, sys, shutil, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from .tin_functions import chain_segments
+from .index_functions import expand_ranges
+
+# Local vertex pairs of triangle edges.
+EDGES = numpy.array([[0, 1], [1, 2], [2, 0]])
+
+
+def level_segments(points, triangles, interval, band=None):
+    """
+    Intersect all triangles with every contour level in one sweep.
+    Levels are integer multiples of interval, band limits them to a
+    (start, stop) range of level indices. Returns node coordinates,
+    node level indices and segments as pairs of node indices.
+    """
+    z = points[:, 2]
+    tz = z[triangles]
+    tmin = tz.min(axis=1)
+    tmax = tz.max(axis=1)
+
+    # Drop triangles outside of level band
+    if band is not None:
+        inside = (tmax >= band[0] * interval) & (tmin < band[1] * interval)
+        triangles = triangles[inside]
+        tmin = tmin[inside]
+        tmax = tmax[inside]
+
+    # Sort triangles by z-range once
+    order = numpy.argsort(tmin, kind='stable')
+    triangles = triangles[order]
+    tmin = tmin[order]
+    tmax = tmax[order]
+
+    # Level range of each triangle, widened by one level to be safe
+    # against rounding and tested exactly below.
+    k_lo = numpy.floor(tmin / interval).astype(numpy.int64)
+    k_hi = numpy.floor(tmax / interval).astype(numpy.int64) + 1
+
+    if band is not None:
+        k_lo = numpy.maximum(k_lo, band[0])
+        k_hi = numpy.minimum(k_hi, band[1] - 1)
+
+    counts = numpy.maximum(k_hi - k_lo + 1, 0)
+
+    # Expand triangle-level pairs
+    tri_idx = numpy.repeat(numpy.arange(len(triangles)), counts)
+    offsets = numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    levels = k_lo[tri_idx] + numpy.arange(len(tri_idx)) - offsets
+
+    # Vertices at or above a level are on its upper side
+    tri = triangles[tri_idx]
+    above = z[tri] >= (levels * interval)[:, None]
+    cross = above[:, EDGES[:, 0]] != above[:, EDGES[:, 1]]
+    valid = cross.any(axis=1)
+
+    tri = tri[valid]
+    levels = levels[valid]
+    cross = cross[valid]
+
+    # Two crossed edges of each triangle
+    slots = numpy.argsort(~cross, axis=1, kind='stable')[:, :2]
+    rows = numpy.arange(len(tri))[:, None]
+    vi = tri[rows, EDGES[slots, 0]]
+    vj = tri[rows, EDGES[slots, 1]]
+    lo = numpy.minimum(vi, vj).astype(numpy.int64)
+    hi = numpy.maximum(vi, vj).astype(numpy.int64)
+
+    # Nodes are unique (edge, level) keys, so neighbour segments
+    # share them exactly.
+    edge_codes, edge_ids = numpy.unique(
+        lo * len(points) + hi, return_inverse=True)
+    edge_ids = edge_ids.reshape(-1, 2)
+
+    kmin = levels.min() if len(levels) else 0
+    nk = (levels.max() - kmin + 1) if len(levels) else 1
+    keys = edge_ids * nk + (levels - kmin)[:, None]
+    node_keys, segments = numpy.unique(keys, return_inverse=True)
+    segments = segments.reshape(-1, 2)
+
+    # Interpolate node coordinates along their edges
+    node_levels = node_keys % nk + kmin
+    node_lo, node_hi = numpy.divmod(edge_codes[node_keys // nk], len(points))
+    p1 = points[node_lo]
+    p2 = points[node_hi]
+    ratio = (node_levels * interval - p1[:, 2]) / (p2[:, 2] - p1[:, 2])
+    nodes = p1 + ratio[:, None] * (p2 - p1)
+    nodes[:, 2] = node_levels * interval
+
+    return nodes, node_levels, segments
+
+def level_classes(levels, major, minor):
+    """
+    Classify integer level indices as major contours.
+    """
+    if major <= 0:
+        return numpy.zeros(len(levels), dtype=bool)
+
+    ratio = major / minor
+    step = round(ratio)
+
+    if step > 0 and abs(ratio - step) < 1e-9:
+        return levels % step == 0
+
+    elevations = levels * minor / major
+    return numpy.abs(elevations - numpy.round(elevations)) < 1e-9
+
+def contour_lines(points, triangles, major, minor, band=None):
+    """
+    Create major and minor contour polylines as coordinate arrays.
+    """
+    major_lines = []
+    minor_lines = []
+
+    if minor <= 0 or len(triangles) == 0:
+        return major_lines, minor_lines
+
+    nodes, levels, segments = level_segments(points, triangles, minor, band)
+    polylines = chain_segments(segments, len(nodes))
+    if not polylines:
+        return major_lines, minor_lines
+
+    first_nodes = numpy.array([polyline[0] for polyline in polylines])
+    majors = level_classes(levels[first_nodes], major, minor)
+
+    for polyline, is_major in zip(polylines, majors):
+        coords = nodes[polyline]
+
+        # Contours passing through vertices repeat points
+        keep = numpy.ones(len(coords), dtype=bool)
+        keep[1:] = (numpy.diff(coords, axis=0) != 0).any(axis=1)
+        coords = coords[keep]
+        if len(coords) < 2: continue
+
+        if is_major:
+            major_lines.append(coords)
+        else:
+            minor_lines.append(coords)
+
+    return major_lines, minor_lines
+
+def level_bands(points, interval, count):
+    """
+    Split level index range of points into (start, stop) bands.
+    """
+    z = points[:, 2]
+    start = int(numpy.floor(z.min() / interval))
+    stop = int(numpy.floor(z.max() / interval)) + 2
+    count = max(1, min(count, stop - start))
+
+    limits = numpy.linspace(start, stop, count + 1).round().astype(int)
+    return [(int(i), int(j)) for i, j in zip(limits[:-1], limits[1:]) if j > i]
+
+def share_array(array):
+    """
+    Copy an array into shared memory, return memory and array spec.
+    """
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = numpy.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+    view[:] = array
+
+    return memory, (memory.name, array.shape, array.dtype.str)
+
+def trace_band(point_spec, triangle_spec, major, minor, band):
+    """
+    Trace contours of a level band from arrays in shared memory.
+    """
+    memories = []
+    arrays = []
+    for name, shape, dtype in [point_spec, triangle_spec]:
+        memory = shared_memory.SharedMemory(name=name)
+        memories.append(memory)
+        arrays.append(numpy.ndarray(shape, dtype=dtype, buffer=memory.buf))
+
+    try:
+        return contour_lines(arrays[0], arrays[1], major, minor, band)
+    finally:
+        del arrays
+        for memory in memories:
+            memory.close()
+
+def python_executable():
+    """
+    Find a Python interpreter to start workers, FreeCAD executable
+    can not run them.
+    """
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+
+    folder = os.path.dirname(sys.executable)
+    for name in ["python.exe", "python3", "python"]:
+        path = os.path.join(folder, name)
+        if os.path.isfile(path): return path
+
+    return shutil.which("python3") or shutil.which("python")
+
+def parallel_contour_lines(points, triangles, major, minor, workers):
+    """
+    Create contour polylines of elevation bands in a process pool.
+    Levels do not cross bands, so band results are only concatenated.
+    """
+    executable = python_executable()
+    if workers <= 1 or minor <= 0 or len(triangles) == 0 or executable is None:
+        return contour_lines(points, triangles, major, minor)
+
+    # Spawn workers, forking would copy the GUI process
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(executable)
+
+    # More bands than workers to balance uneven terrains
+    bands = level_bands(points, minor, workers * 4)
+
+    point_memory, point_spec = share_array(numpy.ascontiguousarray(points))
+    triangle_memory, triangle_spec = share_array(numpy.ascontiguousarray(triangles))
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(trace_band, point_spec, triangle_spec,
+                major, minor, band) for band in bands]
+            results = [future.result() for future in futures]
+
+    # Trace in this process if workers can not run
+    except (BrokenProcessPool, OSError):
+        return contour_lines(points, triangles, major, minor)
+
+    finally:
+        for memory in [point_memory, triangle_memory]:
+            memory.close()
+            memory.unlink()
+
+    major_lines = [line for result in results for line in result[0]]
+    minor_lines = [line for result in results for line in result[1]]
+
+    return major_lines, minor_lines
+
+def simplify_lines(lines, tolerance):
+    """
+    Simplify all polylines at once by Douglas-Peucker algorithm.
+    Points are dropped while their 2D distance is within tolerance.
+    """
+    if tolerance <= 0 or not lines:
+        return lines
+
+    sizes = numpy.array([len(line) for line in lines])
+    coords = numpy.vstack(lines)
+    xy = coords[:, :2]
+
+    ends = numpy.cumsum(sizes) - 1
+    starts = ends - sizes + 1
+    keep = numpy.zeros(len(coords), dtype=bool)
+    keep[starts] = True
+    keep[ends] = True
+
+    # Closed rings are split at their farthest point from start
+    closed = (coords[starts] == coords[ends]).all(axis=1) & (sizes > 2)
+    owners, items = expand_ranges(starts[closed], sizes[closed])
+    v = xy[items] - xy[starts[closed]][owners]
+    dist = numpy.hypot(v[:, 0], v[:, 1])
+    offsets = numpy.cumsum(sizes[closed]) - sizes[closed]
+    far = numpy.zeros(0, dtype=int)
+
+    if len(items):
+        dmax = numpy.maximum.reduceat(dist, offsets)
+        hits = numpy.flatnonzero(dist == dmax[owners])
+        _, first = numpy.unique(owners[hits], return_index=True)
+        far = items[hits[first]]
+        keep[far] = True
+
+    # Split all ranges at their farthest point in each pass
+    lo = numpy.concatenate((starts[~closed], starts[closed], far))
+    hi = numpy.concatenate((ends[~closed], far, ends[closed]))
+    while len(lo):
+        active = hi - lo > 1
+        lo, hi = lo[active], hi[active]
+        if len(lo) == 0: break
+
+        counts = hi - lo - 1
+        owners, items = expand_ranges(lo + 1, counts)
+
+        a = xy[lo][owners]
+        d = xy[hi][owners] - a
+        v = xy[items] - a
+        length = numpy.hypot(d[:, 0], d[:, 1])
+
+        # Chords of repeated points have zero length
+        dist = numpy.where(length > 0,
+            numpy.abs(d[:, 0]*v[:, 1] - d[:, 1]*v[:, 0]) / numpy.where(length > 0, length, 1),
+            numpy.hypot(v[:, 0], v[:, 1]))
+
+        # First farthest point of each range, items are grouped by range
+        dmax = numpy.maximum.reduceat(dist, numpy.cumsum(counts) - counts)
+        hits = numpy.flatnonzero(dist == dmax[owners])
+        _, first = numpy.unique(owners[hits], return_index=True)
+        far = items[hits[first]]
+        split = dmax > tolerance
+
+        keep[far[split]] = True
+        lo = numpy.concatenate((lo[split], far[split]))
+        hi = numpy.concatenate((far[split], hi[split]))
+
+    kept = numpy.add.reduceat(keep, starts)
+    return numpy.split(coords[keep], numpy.cumsum(kept)[:-1])
+
+def smooth_lines(lines, iterations=2):
+    """
+    Smooth all polylines at once by Chaikin corner cutting, which
+    converges to a quadratic B-spline. Open polylines keep their ends.
+    """
+    if not lines:
+        return lines
+
+    for _ in range(iterations):
+        sizes = numpy.array([len(line) for line in lines])
+        coords = numpy.vstack(lines)
+        ends = numpy.cumsum(sizes) - 1
+        starts = ends - sizes + 1
+        closed = (coords[starts] == coords[ends]).all(axis=1)
+
+        # Two new points on each segment
+        first = numpy.ones(len(coords), dtype=bool)
+        first[ends] = False
+        p1 = coords[first]
+        p2 = coords[numpy.flatnonzero(first) + 1]
+        cuts = numpy.empty((2*len(p1), 3))
+        cuts[0::2] = 0.75*p1 + 0.25*p2
+        cuts[1::2] = 0.25*p1 + 0.75*p2
+
+        # Open polylines: start, cuts, end. Closed: cuts, first cut.
+        body = 2*(sizes - 1)
+        head = (~closed).astype(int)
+        out_sizes = body + head + 1
+        out_starts = numpy.cumsum(out_sizes) - out_sizes
+        cut_starts = numpy.cumsum(body) - body
+
+        result = numpy.empty((out_sizes.sum(), 3))
+        owners, items = expand_ranges(out_starts + head, body)
+        result[items] = cuts
+        result[out_starts[~closed]] = coords[starts[~closed]]
+        result[(out_starts + out_sizes - 1)[~closed]] = coords[ends[~closed]]
+        result[(out_starts + out_sizes - 1)[closed]] = cuts[cut_starts[closed]]
+
+        lines = numpy.split(result, numpy.cumsum(out_sizes)[:-1])
+
+    return lines
+
+def line_in_box(coords, box):
+    """
+    Check 2D bounding box of a polyline intersects box.
+    """
+    xmin, ymin, xmax, ymax = box
+    return coords[:, 0].min() <= xmax and coords[:, 0].max() >= xmin \
+        and coords[:, 1].min() <= ymax and coords[:, 1].max() >= ymin
+
+def box_contour_lines(points, triangles, major, minor, box, zmin, zmax):
+    """
+    Trace contours of levels between zmin and zmax which pass through
+    box. Returns level band and major and minor polylines.
+    """
+    band = (int(numpy.floor(zmin / minor)), int(numpy.floor(zmax / minor)) + 1)
+    major_lines, minor_lines = contour_lines(points, triangles, major, minor, band)
+
+    major_lines = [coords for coords in major_lines if line_in_box(coords, box)]
+    minor_lines = [coords for coords in minor_lines if line_in_box(coords, box)]
+
+    return band, major_lines, minor_lines
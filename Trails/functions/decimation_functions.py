@@ -0,0 +1,307 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides error bounded decimation of Terrain triangulations."""
+
+import numpy
+
+
+def orient(points, triangles):
+    """
+    Make all triangles counter clockwise.
+    """
+    a, b, c = (points[triangles[:, i], :2] for i in range(3))
+    area = (b[:, 0]-a[:, 0])*(c[:, 1]-a[:, 1]) - (b[:, 1]-a[:, 1])*(c[:, 0]-a[:, 0])
+
+    triangles = triangles.copy()
+    flip = area < 0
+    triangles[flip] = triangles[flip][:, [0, 2, 1]]
+
+    return triangles
+
+def cross(o, a, b):
+    """
+    2D cross products of OA and OB for arrays of points.
+    """
+    return (a[..., 0]-o[..., 0])*(b[..., 1]-o[..., 1]) \
+        - (a[..., 1]-o[..., 1])*(b[..., 0]-o[..., 0])
+
+def clip_rings(points, rings):
+    """
+    Triangulate counter clockwise polygons of same vertex count by ear
+    clipping. Ears with best shape are clipped first. Returns triangles
+    of each ring and mask of succeeded rings.
+    """
+    count = len(rings)
+    rows = numpy.arange(count)
+    ok = numpy.ones(count, dtype=bool)
+    result = []
+
+    while rings.shape[1] > 3:
+        a, c = numpy.roll(rings, 1, axis=1), numpy.roll(rings, -1, axis=1)
+        pa, pb, pc = points[a, :2], points[rings, :2], points[c, :2]
+        area = cross(pa, pb, pc)
+
+        # No other vertex of ring in ear
+        pj = points[rings, :2][:, None, :, :]
+        inside = (cross(pa[:, :, None], pb[:, :, None], pj) >= 0) \
+            & (cross(pb[:, :, None], pc[:, :, None], pj) >= 0) \
+            & (cross(pc[:, :, None], pa[:, :, None], pj) >= 0)
+        inside &= (rings[:, None, :] != a[:, :, None]) \
+            & (rings[:, None, :] != rings[:, :, None]) \
+            & (rings[:, None, :] != c[:, :, None])
+
+        # Minimum angle measure as doubled area to squared longest edge
+        longest = numpy.maximum.reduce([((pb - pa)**2).sum(axis=2),
+            ((pc - pb)**2).sum(axis=2), ((pa - pc)**2).sum(axis=2)])
+        quality = numpy.divide(area, longest, out=numpy.zeros_like(area),
+            where=longest > 0)
+        quality[(area <= 1e-9) | inside.any(axis=2)] = -numpy.inf
+
+        best = quality.argmax(axis=1)
+        ok &= quality[rows, best] > -numpy.inf
+        result.append(numpy.column_stack(
+            (a[rows, best], rings[rows, best], c[rows, best])))
+
+        keep = numpy.ones(rings.shape, dtype=bool)
+        keep[rows, best] = False
+        rings = rings[keep].reshape(count, -1)
+
+    ok &= cross(*(points[rings[:, i], :2] for i in range(3))) > 1e-9
+    result.append(rings)
+
+    return numpy.stack(result, axis=1), ok
+
+def vertical_errors(points, triangles, owners, covered):
+    """
+    Locate covered points in triangles of their owner rings and get
+    their vertical errors. Returns triangle index and error of each
+    point, and mask of points which are in triangles.
+    """
+    tris = points[triangles[owners]]
+    pa, pb, pc = tris[:, :, 0], tris[:, :, 1], tris[:, :, 2]
+    p = points[covered][:, None, :]
+
+    # Barycentric weights with small tolerance
+    area = cross(pa, pb, pc)
+    wa = cross(pb, pc, p) / area
+    wb = cross(pc, pa, p) / area
+    wc = 1 - wa - wb
+    inside = (wa >= -1e-9) & (wb >= -1e-9) & (wc >= -1e-9)
+
+    index = inside.argmax(axis=1)
+    rows = numpy.arange(len(covered))
+    z = wa[rows, index]*pa[rows, index, 2] + wb[rows, index]*pb[rows, index, 2] \
+        + wc[rows, index]*pc[rows, index, 2]
+
+    return index, numpy.abs(p[:, 0, 2] - z), inside.any(axis=1)
+
+
+class Decimation:
+    """
+    Greedy vertex removal by vertical error priority. Each removed
+    vertex is kept in the triangle covering it, so errors are measured
+    against the final surface. Removal errors are evaluated for many
+    vertices at once and non adjacent vertices are removed in rounds.
+    """
+
+    def __init__(self, points, triangles):
+        self.points = points - numpy.r_[points[:, :2].mean(axis=0), 0]
+        self.triangles = {}
+        self.stars = [set() for _ in range(len(points))]
+        self.covered = {}
+        self.errors = numpy.zeros(len(points))
+        self.removed = [False] * len(points)
+        self.next_id = 0
+
+        for tri in orient(points, triangles).tolist():
+            self.add_triangle(tuple(tri), [])
+
+    def add_triangle(self, tri, covered):
+        """
+        Add a triangle with points covered by it.
+        """
+        tid = self.next_id
+        self.next_id += 1
+
+        self.triangles[tid] = tri
+        self.covered[tid] = covered
+        for v in tri:
+            self.stars[v].add(tid)
+
+    def remove_triangle(self, tid):
+        """
+        Remove a triangle and return points covered by it.
+        """
+        for v in self.triangles.pop(tid):
+            self.stars[v].discard(tid)
+
+        return self.covered.pop(tid)
+
+    def ring(self, v):
+        """
+        Get ordered neighbour ring of an interior vertex, None for
+        boundary vertices.
+        """
+        following = {}
+        for tid in self.stars[v]:
+            a, b, c = self.triangles[tid]
+            if a == v: following[b] = c
+            elif b == v: following[c] = a
+            else: following[a] = b
+
+        # Repeated edge starts are not a simple ring
+        if not following or len(following) != len(self.stars[v]): return None
+
+        start = next(iter(following))
+        ring = [start]
+        while True:
+            nxt = following.get(ring[-1])
+            if nxt is None: return None
+            if nxt == start: break
+            ring.append(nxt)
+
+        if len(ring) != len(following): return None
+        return ring
+
+    def evaluate(self, vertices):
+        """
+        Try removing vertices. Returns error, new triangles, covered
+        points, their triangle indexes and errors of each removable
+        vertex, rings of same size are evaluated together.
+        """
+        groups = {}
+        for v in vertices:
+            ring = self.ring(v)
+            if ring is not None: groups.setdefault(len(ring), []).append((v, ring))
+
+        results = {}
+        for items in groups.values():
+            tris, ok = clip_rings(self.points,
+                numpy.array([ring for v, ring in items], dtype=numpy.int64))
+
+            covered = [[v] + [u for tid in self.stars[v] for u in self.covered[tid]]
+                for v, ring in items]
+            sizes = numpy.array([len(i) for i in covered])
+            owners = numpy.repeat(numpy.arange(len(items)), sizes)
+            flat = numpy.fromiter((u for i in covered for u in i),
+                dtype=numpy.int64, count=sizes.sum())
+
+            index, errors, inside = vertical_errors(self.points, tris, owners, flat)
+            starts = numpy.r_[0, numpy.cumsum(sizes)[:-1]]
+            ok &= numpy.logical_and.reduceat(inside, starts)
+            worst = numpy.maximum.reduceat(errors, starts)
+
+            for i in numpy.flatnonzero(ok).tolist():
+                start, end = starts[i], starts[i] + sizes[i]
+                results[items[i][0]] = (worst[i], tris[i], covered[i],
+                    index[start:end], errors[start:end])
+
+        return results
+
+    def neighbours(self, v):
+        """
+        Get vertices sharing a triangle with a vertex.
+        """
+        return {u for tid in self.stars[v] for u in self.triangles[tid]} - {v}
+
+    def remove(self, v, result):
+        """
+        Remove a vertex and add triangles of its filled ring.
+        """
+        error, tri, covered, owners, errors = result
+
+        for tid in list(self.stars[v]):
+            self.remove_triangle(tid)
+
+        groups = [[] for _ in tri]
+        for u, i in zip(covered, owners.tolist()):
+            groups[i].append(u)
+
+        for item, group in zip(tri.tolist(), groups):
+            self.add_triangle(tuple(item), group)
+
+        self.errors[covered] = errors
+        self.removed[v] = True
+
+    def run(self, tolerance, target=0, progress=None):
+        """
+        Remove vertices while their error is within tolerance, stops
+        at target vertex count. Progress gets percent after each round.
+        """
+        remaining = len(self.points)
+        changed = range(len(self.points))
+        results = {}
+
+        while remaining > target:
+            # Only vertices with changed neighbourhood are evaluated again
+            for v in changed:
+                results.pop(v, None)
+            results.update(self.evaluate(changed))
+
+            candidates = sorted((result[0], v) for v, result in results.items()
+                if result[0] <= tolerance)
+            if not candidates: break
+
+            # Removed vertices of a round are not adjacent
+            blocked = set()
+            changed = set()
+            for error, v in candidates:
+                if v in blocked: continue
+                if remaining <= target: break
+
+                neighbours = self.neighbours(v)
+                self.remove(v, results.pop(v))
+                blocked.update(neighbours)
+                changed.update(neighbours)
+                remaining -= 1
+
+            if progress:
+                done = len(self.points) - remaining
+                progress(100 * done / (done + len(candidates)))
+
+    def result(self):
+        """
+        Get kept points, triangles and vertical errors of all points.
+        """
+        triangles = numpy.array(list(self.triangles.values()), dtype=numpy.int64).reshape(-1, 3)
+        kept = numpy.flatnonzero(~numpy.array(self.removed, dtype=bool))
+
+        index = numpy.full(len(self.removed), -1)
+        index[kept] = numpy.arange(len(kept))
+
+        return kept, index[triangles].astype(numpy.int32), self.errors
+
+
+def decimate(points, triangles, tolerance, target=0, progress=None):
+    """
+    Decimate triangulation to a maximum vertical error. Returns kept
+    points, triangles, maximum error and RMS error of all points.
+    """
+    decimation = Decimation(points, triangles)
+    decimation.run(tolerance, target, progress)
+    kept, triangles, errors = decimation.result()
+
+    max_error = errors.max() if len(errors) else 0
+    rms_error = numpy.sqrt((errors**2).mean()) if len(errors) else 0
+
+    return points[kept], triangles, max_error, rms_error
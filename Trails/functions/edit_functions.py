@@ -0,0 +1,210 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides local Terrain edits with compact deltas for undo."""
+
+import numpy
+
+from .tin_functions import boundary_edges
+
+
+class Delta:
+    """
+    A local triangulation change. Removed triangles are dropped, new
+    triangles are appended, points are appended or trimmed at the end.
+    Rows of removed triangles are found by their vertices if not given.
+    """
+
+    def __init__(self, rows, removed, added, points=None, trim=0):
+        self.rows = None if rows is None else numpy.asarray(rows, dtype=numpy.int64)
+        self.removed = numpy.asarray(removed, dtype=numpy.int32).reshape(-1, 3)
+        self.added = numpy.asarray(added, dtype=numpy.int32).reshape(-1, 3)
+        self.points = numpy.zeros((0, 3)) if points is None else points.reshape(-1, 3)
+        self.trim = trim
+        self.trimmed = numpy.zeros((0, 3))
+
+    def vertices(self):
+        """
+        Get vertex indexes of removed and added triangles.
+        """
+        return numpy.unique(numpy.concatenate(
+            (self.removed.ravel(), self.added.ravel())))
+
+
+class EditSession:
+    """
+    Edit point and triangle arrays in place and keep deltas of edits.
+    """
+
+    def __init__(self, points, triangles):
+        self.points = points
+        self.triangles = triangles
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def find(self, triangles):
+        """
+        Find rows of triangles by their vertices.
+        """
+        rows, inverse = numpy.unique(numpy.vstack((self.triangles, triangles)),
+            axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        lookup = numpy.full(len(rows), -1)
+        lookup[inverse[:len(self.triangles)]] = numpy.arange(len(self.triangles))
+
+        return numpy.sort(lookup[inverse[len(self.triangles):]])
+
+    def apply(self, delta):
+        """
+        Apply a delta and return its inverse.
+        """
+        if delta.rows is None: delta.rows = self.find(delta.removed)
+
+        self.triangles = numpy.vstack((
+            numpy.delete(self.triangles, delta.rows, axis=0), delta.added))
+
+        trimmed = self.points[len(self.points) - delta.trim:]
+        if delta.trim: self.points = self.points[:len(self.points) - delta.trim]
+        if len(delta.points): self.points = numpy.vstack((self.points, delta.points))
+        delta.trimmed = trimmed
+
+        return Delta(None, delta.added, delta.removed, trimmed, len(delta.points))
+
+    def touched(self, delta):
+        """
+        Get coordinates of vertices of an applied delta. Removed triangles
+        can refer to trimmed points, so they are taken from the points
+        before the delta.
+        """
+        count = len(self.points) - len(delta.points)
+        before = numpy.vstack((self.points[:count], delta.trimmed))
+
+        return numpy.vstack((before[numpy.unique(delta.removed)],
+            self.points[numpy.unique(delta.added)]))
+
+    def edit(self, delta):
+        """
+        Apply a new edit, it can be undone.
+        """
+        if delta is None: return None
+
+        self.undo_stack.append(self.apply(delta))
+        self.redo_stack.clear()
+        return delta
+
+    def undo(self):
+        """
+        Revert last edit, returns applied delta.
+        """
+        if not self.undo_stack: return None
+
+        delta = self.undo_stack.pop()
+        self.redo_stack.append(self.apply(delta))
+        return delta
+
+    def redo(self):
+        """
+        Apply last reverted edit, returns applied delta.
+        """
+        if not self.redo_stack: return None
+
+        delta = self.redo_stack.pop()
+        self.undo_stack.append(self.apply(delta))
+        return delta
+
+    def area(self, triangle):
+        """
+        Signed doubled area of a triangle.
+        """
+        a, b, c = self.points[list(triangle), :2]
+        return (b[0]-a[0])*(c[1]-a[1]) - (b[1]-a[1])*(c[0]-a[0])
+
+    def add_point(self, row, point):
+        """
+        Split triangle at row by a new point.
+        """
+        a, b, c = self.triangles[row].tolist()
+        p = len(self.points)
+
+        return self.edit(Delta([row], [[a, b, c]],
+            [[a, b, p], [b, c, p], [c, a, p]], numpy.array(point, dtype=float)))
+
+    def delete_triangles(self, rows):
+        """
+        Remove triangles at rows.
+        """
+        rows = numpy.unique(numpy.asarray(rows, dtype=numpy.int64))
+        if len(rows) == 0: return None
+
+        return self.edit(Delta(rows, self.triangles[rows], []))
+
+    def swap_edge(self, row1, row2):
+        """
+        Swap shared edge of two triangles, convex pairs only.
+        """
+        t1, t2 = self.triangles[row1].tolist(), self.triangles[row2].tolist()
+        shared = [i for i in t1 if i in t2]
+        if row1 == row2 or len(shared) != 2: return None
+
+        u, v = shared
+        c = [i for i in t1 if i not in shared][0]
+        d = [i for i in t2 if i not in shared][0]
+
+        # New triangles must keep orientation of old ones
+        sign = numpy.sign(self.area(t1))
+        new = [[c, u, d], [c, d, v]]
+        areas = [self.area(i) for i in new]
+
+        if all(numpy.sign(i) == -sign for i in areas):
+            new = [[c, d, u], [c, v, d]]
+        elif not all(numpy.sign(i) == sign for i in areas):
+            return None
+
+        return self.edit(Delta([row1, row2], [t1, t2], new))
+
+
+def boundary_touched(triangles, delta):
+    """
+    Check edges of an applied delta were or are on boundary. Added
+    triangles are the last rows of triangles.
+    """
+    vertices = delta.vertices()
+    count = len(triangles) - len(delta.added)
+
+    incident = numpy.isin(triangles[:count], vertices).any(axis=1)
+    before = numpy.vstack((triangles[:count][incident], delta.removed))
+    after = numpy.vstack((triangles[:count][incident], delta.added))
+
+    # Edges of removed and added triangles
+    changed = numpy.vstack((delta.removed, delta.added))
+    own = numpy.sort(changed[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    n = int(max(triangles.max(initial=0), changed.max(initial=0))) + 1
+
+    for tris in [before, after]:
+        if len(tris) == 0: continue
+
+        edges = numpy.sort(boundary_edges(tris), axis=1)
+        if numpy.isin(edges[:, 0] * n + edges[:, 1], own[:, 0] * n + own[:, 1]).any():
+            return True
+
+    return False
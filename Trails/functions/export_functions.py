@@ -0,0 +1,107 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides streaming point file writing functions for Cluster exports."""
+
+import numpy
+
+DELIMITERS = {"Space": " ", "Comma": ",", "Tab": "\t"}
+
+
+def row_format(order, delimiter, precision=3, fixed=True):
+    """
+    Create row format of fields in order. Fields are name, easting,
+    northing, elevation and description.
+    """
+    number = "%.{}f".format(precision) if fixed else "%r"
+    fields = ["%s", number, number, number, "%s"]
+
+    return delimiter.join(fields[i] for i in order) + "\n"
+
+def format_block(form, order, names, coords, descriptions, precision, fixed):
+    """
+    Format a block of points with coordinates in mm as text.
+    """
+    coords = coords / 1000
+    if not fixed: coords = numpy.round(coords, precision)
+
+    x, y, z = coords.T.tolist()
+    fields = [names, x, y, z, descriptions]
+
+    return "".join(map(form.__mod__, zip(*[fields[i] for i in order])))
+
+def fill_group(names, coords, descriptions, counter=1):
+    """
+    Number points without names and leave missing descriptions empty.
+    Returns filled group and next number.
+    """
+    count = len(coords)
+    names = numpy.array(list(names[:count]) + [""] * (count - len(names)), dtype=object)
+
+    empty = numpy.flatnonzero(names == "")
+    names[empty] = [str(i) for i in range(counter, counter + len(empty))]
+    names = names.tolist()
+    counter += len(empty)
+
+    if len(descriptions) < count:
+        descriptions = list(descriptions) + [""] * (count - len(descriptions))
+
+    return (names, coords, descriptions), counter
+
+def merge_groups(groups):
+    """
+    Merge point groups to one group of names, coordinates and descriptions.
+    """
+    names, coords, descriptions = [], [], []
+    counter = 1
+    for group in groups:
+        group, counter = fill_group(*group, counter)
+        names.extend(group[0])
+        coords.append(group[1])
+        descriptions.extend(group[2])
+
+    coords = numpy.vstack(coords) if coords else numpy.zeros((0, 3))
+    return names, coords, descriptions
+
+def write_points(path, groups, order, delimiter, precision=3, fixed=True,
+        block=1 << 16, progress=None):
+    """
+    Write point groups of names, Nx3 coordinates in mm and descriptions
+    to a point file block by block. Points without names are numbered.
+    Progress is called with count of written points.
+    """
+    form = row_format(order, delimiter, precision, fixed)
+    written, counter = 0, 1
+
+    with open(path, 'w', buffering=1 << 20) as file:
+        for group in groups:
+            (names, coords, descriptions), counter = fill_group(*group, counter)
+
+            for start in range(0, len(coords), block):
+                end = start + block
+                file.write(format_block(form, order, names[start:end],
+                    coords[start:end], descriptions[start:end], precision, fixed))
+
+                written += len(coords[start:end])
+                if progress: progress(written)
+
+    return written
@@ -0,0 +1,118 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides chunked point file reading functions for Cluster imports."""
+
+import numpy
+import csv, os
+
+DELIMITERS = {"Space": None, "Comma": ",", "Tab": "\t"}
+
+
+def parse_rows(lines, delimiter, columns):
+    """
+    Parse lines one by one, rows without valid coordinates are skipped.
+    """
+    name, x, y, z, description = columns
+    if delimiter is None:
+        reader = csv.reader(lines, delimiter=' ', skipinitialspace=True)
+    else:
+        reader = csv.reader(lines, delimiter=delimiter)
+
+    names, coords, descriptions = [], [], []
+    for row in reader:
+        try: point = float(row[x]), float(row[y]), float(row[z])
+        except (ValueError, IndexError): continue
+
+        coords.append(point)
+        names.append(row[name] if 0 <= name < len(row) else "")
+        descriptions.append(row[description] if 0 <= description < len(row) else "")
+
+    return names, numpy.array(coords, dtype=numpy.float64).reshape(-1, 3), descriptions
+
+def parse_block(lines, delimiter, columns):
+    """
+    Parse a block of lines into coordinate and text arrays at once,
+    irregular blocks are parsed row by row.
+    """
+    name, x, y, z, description = columns
+    if any('"' in i for i in lines[:1]):
+        return parse_rows(lines, delimiter, columns)
+
+    # Text columns which are missing in file are left empty
+    count = max(len(i.split(delimiter)) for i in lines[:100])
+    texts = [i for i in (name, description) if 0 <= i < count]
+
+    try:
+        coords = numpy.loadtxt(lines, delimiter=delimiter, comments=None,
+            usecols=(x, y, z), ndmin=2, dtype=numpy.float64)
+        if texts:
+            text = numpy.loadtxt(lines, delimiter=delimiter, comments=None,
+                usecols=texts, ndmin=2, dtype=str)
+
+    except (ValueError, IndexError):
+        return parse_rows(lines, delimiter, columns)
+
+    empty = [""] * len(coords)
+    names = text[:, texts.index(name)].tolist() if name in texts else empty
+    descriptions = text[:, texts.index(description)].tolist() \
+        if description in texts else empty
+
+    return names, coords, descriptions
+
+def read_points(path, delimiter, columns, chunk_size=1 << 25, progress=None):
+    """
+    Read a point file in chunks of about chunk_size bytes. Columns are
+    zero based name, easting, northing, elevation and description
+    indexes. Yields names, Nx3 coordinates in mm and descriptions.
+    Progress is called with read fraction of file after each chunk.
+    """
+    size = max(os.path.getsize(path), 1)
+    position = 0
+
+    with open(path, 'r') as file:
+        while True:
+            lines = file.readlines(chunk_size)
+            if not lines: break
+
+            # Read characters are close to bytes, tell() can't be used here
+            position += sum(map(len, lines))
+            if progress: progress(min(position / size, 1))
+
+            lines = [i for i in lines if i.strip()]
+            if not lines: continue
+
+            names, coords, descriptions = parse_block(lines, delimiter, columns)
+            yield names, coords * 1000, descriptions
+
+def preview_rows(path, delimiter, count=500):
+    """
+    Split first rows of a point file into columns.
+    """
+    rows = []
+    with open(path, 'r') as file:
+        for line in file:
+            if len(rows) == count: break
+            if line.strip():
+                rows.append(line.split(delimiter) if delimiter else line.split())
+
+    return rows
@@ -0,0 +1,254 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides spatial index classes for Trails objects."""
+
+import numpy
+import scipy.spatial
+
+from .selection_functions import points_in_polygon
+
+
+def expand_ranges(starts, counts):
+    """
+    Concatenate integer ranges given by starts and counts.
+    Returns owner index of each item and the items.
+    """
+    owners = numpy.repeat(numpy.arange(len(starts)), counts)
+    offsets = numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    items = starts[owners] + numpy.arange(len(owners)) - offsets
+
+    return owners, items
+
+
+class GridIndex:
+    """
+    Uniform 2D grid of items by their bounding boxes.
+    """
+
+    def __init__(self, mins, maxs, size=None):
+        '''
+        Build grid cells of item bounding boxes.
+        '''
+        self.origin = mins.min(axis=0)
+        extent = numpy.maximum(maxs.max(axis=0) - self.origin, 1e-9)
+
+        # About one item per cell by default
+        if size is None:
+            size = numpy.sqrt(extent[0] * extent[1] / max(len(mins), 1))
+        self.size = max(float(size), 1e-9)
+        self.shape = numpy.maximum(
+            numpy.ceil(extent / self.size).astype(numpy.int64), 1)
+
+        # Item-cell pairs sorted by cell
+        lo = self.cells(mins)
+        spans = self.cells(maxs) - lo + 1
+        items, local = expand_ranges(
+            numpy.zeros(len(lo), numpy.int64), spans[:, 0] * spans[:, 1])
+        cols = lo[items, 0] + local % spans[items, 0]
+        rows = lo[items, 1] + local // spans[items, 0]
+        cell_ids = rows * self.shape[0] + cols
+
+        order = numpy.argsort(cell_ids, kind='stable')
+        self.items = items[order]
+        self.indptr = numpy.zeros(self.shape[0] * self.shape[1] + 1, numpy.int64)
+        numpy.cumsum(numpy.bincount(
+            cell_ids, minlength=len(self.indptr) - 1), out=self.indptr[1:])
+
+    def cells(self, xy):
+        """
+        Return column and row of cells which contain points.
+        """
+        cells = numpy.floor((xy - self.origin) / self.size).astype(numpy.int64)
+        return numpy.clip(cells, 0, self.shape - 1)
+
+    def candidates(self, xy):
+        """
+        Return query index and item pairs in the cells of points.
+        """
+        cells = self.cells(xy)
+        cell_ids = cells[:, 1] * self.shape[0] + cells[:, 0]
+        starts = self.indptr[cell_ids]
+        queries, positions = expand_ranges(
+            starts, self.indptr[cell_ids + 1] - starts)
+
+        return queries, self.items[positions]
+
+    def box_candidates(self, xmin, ymin, xmax, ymax):
+        """
+        Return unique items in the cells which overlap a box.
+        """
+        lo = self.cells(numpy.array([[xmin, ymin]]))[0]
+        hi = self.cells(numpy.array([[xmax, ymax]]))[0]
+
+        rows = numpy.arange(lo[1], hi[1] + 1)
+        starts = self.indptr[rows * self.shape[0] + lo[0]]
+        ends = self.indptr[rows * self.shape[0] + hi[0] + 1]
+        _, positions = expand_ranges(starts, ends - starts)
+
+        return numpy.unique(self.items[positions])
+
+
+class TriangleIndex:
+    """
+    2D grid index of triangles to find triangles and interpolate
+    elevations at points.
+    """
+
+    def __init__(self, points, triangles):
+        '''
+        Build grid index of triangle bounding boxes.
+        '''
+        self.points = points
+        self.triangles = triangles
+
+        xy = points[triangles, :2]
+        self.grid = GridIndex(xy.min(axis=1), xy.max(axis=1))
+
+    def locate(self, xy, tolerance=1e-9):
+        """
+        Find triangles which contain points and their barycentric weights.
+        Points outside of the triangulation get -1 triangle index.
+        """
+        xy = numpy.asarray(xy, dtype=numpy.float64).reshape(-1, 2)
+        queries, candidates = self.grid.candidates(xy)
+
+        # Barycentric coordinates of query points in candidate triangles
+        tri = self.triangles[candidates]
+        p1 = self.points[tri[:, 0], :2]
+        v1 = self.points[tri[:, 1], :2] - p1
+        v2 = self.points[tri[:, 2], :2] - p1
+        vp = xy[queries] - p1
+
+        det = v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0]
+        valid = det != 0
+        det[~valid] = 1.0
+        w2 = (vp[:, 0] * v2[:, 1] - vp[:, 1] * v2[:, 0]) / det
+        w3 = (v1[:, 0] * vp[:, 1] - v1[:, 1] * vp[:, 0]) / det
+        w1 = 1.0 - w2 - w3
+
+        inside = valid & (w1 >= -tolerance) & (w2 >= -tolerance) & (w3 >= -tolerance)
+        queries = queries[inside]
+
+        # First hit of each query point
+        first = numpy.unique(queries, return_index=True)[1]
+        hits = numpy.flatnonzero(inside)[first]
+
+        index = numpy.full(len(xy), -1, dtype=numpy.int64)
+        weights = numpy.zeros((len(xy), 3))
+        index[queries[first]] = candidates[hits]
+        weights[queries[first]] = numpy.column_stack(
+            (w1[hits], w2[hits], w3[hits]))
+
+        return index, weights
+
+    def triangle_at(self, xy):
+        """
+        Return index of triangle at each point, -1 if it is outside.
+        """
+        return self.locate(xy)[0]
+
+    def elevations(self, xy):
+        """
+        Interpolate elevation at each point, nan if it is outside.
+        """
+        index, weights = self.locate(xy)
+        hit = index >= 0
+
+        z = numpy.full(len(index), numpy.nan)
+        vertices = self.triangles[index[hit]]
+        z[hit] = (self.points[vertices, 2] * weights[hit]).sum(axis=1)
+
+        return z
+
+
+class PointIndex:
+    """
+    2D KD-tree index of points for radius, nearest, box, polygon
+    and polyline distance queries.
+    """
+
+    def __init__(self, points):
+        '''
+        Build KD-tree of point XY coordinates.
+        '''
+        self.points = points
+        self.tree = scipy.spatial.cKDTree(points[:, :2])
+
+    def radius(self, center, radius):
+        """
+        Return sorted indexes of points within radius of center.
+        """
+        rows = self.tree.query_ball_point(numpy.asarray(center)[:2], radius)
+        return numpy.sort(numpy.asarray(rows, dtype=numpy.int64))
+
+    def nearest(self, center, count=1):
+        """
+        Return indexes of nearest points to center, closest first.
+        """
+        count = min(count, len(self.points))
+        if count == 0: return numpy.zeros(0, dtype=numpy.int64)
+
+        _, rows = self.tree.query(numpy.asarray(center)[:2], k=count)
+        return numpy.atleast_1d(rows).astype(numpy.int64)
+
+    def box(self, xmin, ymin, xmax, ymax):
+        """
+        Return sorted indexes of points in a box.
+        """
+        center = (xmin + xmax) / 2, (ymin + ymax) / 2
+        rows = self.radius(center, numpy.hypot(xmax - xmin, ymax - ymin) / 2)
+
+        xy = self.points[rows, :2]
+        inside = (xy[:, 0] >= xmin) & (xy[:, 0] <= xmax) \
+            & (xy[:, 1] >= ymin) & (xy[:, 1] <= ymax)
+
+        return rows[inside]
+
+    def polygon(self, polygon):
+        """
+        Return sorted indexes of points in a closed polygon.
+        """
+        polygon = numpy.asarray(polygon, dtype=numpy.float64)[:, :2]
+        rows = self.box(*polygon.min(axis=0), *polygon.max(axis=0))
+
+        return rows[points_in_polygon(self.points[rows, :2], polygon)]
+
+    def near_line(self, line, distance):
+        """
+        Return sorted indexes of points within distance of a polyline.
+        """
+        line = numpy.asarray(line, dtype=numpy.float64)[:, :2]
+        lo, hi = line.min(axis=0) - distance, line.max(axis=0) + distance
+        rows = self.box(*lo, *hi)
+        xy = self.points[rows, :2]
+
+        # Loop segments, points are measured at once
+        near = numpy.zeros(len(rows), dtype=bool)
+        for start, end in zip(line[:-1], line[1:]):
+            segment = end - start
+            length = max(segment @ segment, 1e-12)
+            t = numpy.clip((xy - start) @ segment / length, 0, 1)
+            gaps = xy - (start + t[:, None] * segment)
+            near |= numpy.hypot(gaps[:, 0], gaps[:, 1]) <= distance
+
+        return rows[near]
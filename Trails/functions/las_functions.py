@@ -0,0 +1,123 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides memory mapped LAS point cloud reading functions."""
+
+import numpy
+import struct
+
+
+def read_header(path):
+    """
+    Read LAS 1.2-1.4 public header block.
+    """
+    with open(path, 'rb') as file:
+        data = file.read(375)
+
+    if data[:4] != b'LASF':
+        raise ValueError("{} is not a LAS file".format(path))
+
+    header_size, offset = struct.unpack_from('<HI', data, 94)
+    point_format, record_length, count = struct.unpack_from('<BHI', data, 104)
+    maxs_mins = struct.unpack_from('<6d', data, 179)
+
+    # Compressed LAZ files set high bits of point format
+    if point_format & 0xC0:
+        raise ValueError("{} is compressed, only LAS is supported".format(path))
+
+    # LAS 1.4 keeps large point counts in extended field
+    if (data[24], data[25]) >= (1, 4) and header_size >= 375:
+        count = struct.unpack_from('<Q', data, 247)[0] or count
+
+    return {
+        "version": (data[24], data[25]),
+        "offset": offset,
+        "format": point_format,
+        "length": record_length,
+        "count": count,
+        "scale": numpy.array(struct.unpack_from('<3d', data, 131)),
+        "origin": numpy.array(struct.unpack_from('<3d', data, 155)),
+        "mins": numpy.array(maxs_mins[1::2]),
+        "maxs": numpy.array(maxs_mins[0::2])}
+
+def point_dtype(header):
+    """
+    Structured dtype of point records, only coordinates and
+    classification fields are named.
+    """
+    classification = 16 if header["format"] >= 6 else 15
+
+    return numpy.dtype({
+        "names": ["X", "Y", "Z", "classification"],
+        "formats": ["<i4", "<i4", "<i4", "u1"],
+        "offsets": [0, 4, 8, classification],
+        "itemsize": header["length"]})
+
+def read_las(path, classes=None, bounds=None, chunk_size=1 << 22, progress=None):
+    """
+    Read LAS points in chunks of records. Points are filtered by
+    classification codes and xmin, ymin, xmax, ymax bounds in file
+    units. Yields names, Nx3 coordinates in mm and classification
+    codes as descriptions. Progress is called with read fraction of
+    records.
+    """
+    header = read_header(path)
+    if header["count"] == 0: return
+
+    records = numpy.memmap(path, dtype=point_dtype(header), mode='r',
+        offset=header["offset"], shape=(header["count"],))
+    scale, origin = header["scale"], header["origin"]
+
+    # Bounds are compared with raw integer coordinates
+    if bounds is not None:
+        xmin, ymin, xmax, ymax = bounds
+        lower = (numpy.array([xmin, ymin]) - origin[:2]) / scale[:2]
+        upper = (numpy.array([xmax, ymax]) - origin[:2]) / scale[:2]
+
+    for start in range(0, header["count"], chunk_size):
+        block = records[start:start + chunk_size]
+        mask = numpy.ones(len(block), dtype=bool)
+
+        # Legacy formats keep flags in high bits of classification
+        codes = block["classification"]
+        if header["format"] < 6: codes = codes & 0x1F
+
+        if classes is not None:
+            mask &= numpy.isin(codes, classes)
+
+        if bounds is not None:
+            x, y = block["X"], block["Y"]
+            mask &= (x >= lower[0]) & (x <= upper[0]) \
+                & (y >= lower[1]) & (y <= upper[1])
+
+        # Only selected records are copied and scaled
+        index = numpy.flatnonzero(mask)
+        coords = numpy.empty((len(index), 3))
+        for i, field in enumerate(["X", "Y", "Z"]):
+            coords[:, i] = block[field][index] * scale[i] + origin[i]
+
+        if progress: progress((start + len(block)) / header["count"])
+        if len(index) == 0: continue
+
+        yield [""] * len(index), coords * 1000, codes[index].astype(str).tolist()
+
+    del records
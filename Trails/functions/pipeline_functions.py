@@ -0,0 +1,98 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides a dependency graph of derived products for scripted objects."""
+
+import time
+
+
+class Pipeline:
+    """
+    Keep dirty flags of products which depend on each other and
+    record which products are rebuilt and how long it takes.
+    """
+
+    def __init__(self, graph):
+        '''
+        Graph maps each product to products it depends on,
+        in rebuild order. All products start dirty.
+        '''
+        self.graph = graph
+        self.dependents = {name: [] for name in graph}
+        for name, dependencies in graph.items():
+            for dependency in dependencies:
+                self.dependents[dependency].append(name)
+
+        self.dirty = set(graph)
+        self.report = []
+
+    def invalidate(self, name):
+        """
+        Mark product and all products depending on it as dirty.
+        """
+        self.dirty.add(name)
+        for dependent in self.dependents[name]:
+            self.invalidate(dependent)
+
+    def validate(self, name):
+        """
+        Mark product as up to date and products depending on it as dirty.
+        """
+        self.dirty.discard(name)
+        for dependent in self.dependents[name]:
+            self.invalidate(dependent)
+
+    def is_dirty(self, name):
+        """
+        Check product needs a rebuild.
+        """
+        return name in self.dirty
+
+    def stale(self):
+        """
+        Return dirty products in rebuild order.
+        """
+        return [name for name in self.graph if name in self.dirty]
+
+    def begin(self):
+        """
+        Start a new rebuild report.
+        """
+        self.report = []
+
+    def run(self, name, function, *args):
+        """
+        Rebuild product and record its duration.
+        """
+        start = time.perf_counter()
+        result = function(*args)
+        self.validate(name)
+        self.report.append((name, time.perf_counter() - start))
+
+        return result
+
+    def update(self, name, function, *args):
+        """
+        Rebuild product only if it is dirty.
+        """
+        if name in self.dirty:
+            return self.run(name, function, *args)
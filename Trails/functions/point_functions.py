@@ -0,0 +1,182 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides columnar point table class for Cluster objects."""
+
+import numpy
+
+
+class PointTable:
+    """
+    Columnar table of point coordinates, names and description codes.
+    Columns have spare capacity so appends don't copy the table.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.coord_buffer = numpy.zeros((0, 3))
+        self.name_buffer = numpy.zeros(0, dtype="U1")
+        self.code_buffer = numpy.zeros(0, dtype=numpy.int32)
+        self.code_table = []
+        self.code_index = {}
+        self.update_views()
+
+    def __len__(self):
+        return self.size
+
+    def update_views(self):
+        """
+        Update column views of used rows.
+        """
+        self.coords = self.coord_buffer[:self.size]
+        self.names = self.name_buffer[:self.size]
+        self.codes = self.code_buffer[:self.size]
+
+    def reserve(self, count, width=1):
+        """
+        Grow columns to hold count rows and names of width characters.
+        """
+        if count > len(self.coord_buffer):
+            capacity = max(count, 2 * len(self.coord_buffer), 1024)
+
+            coords = numpy.zeros((capacity, 3))
+            coords[:self.size] = self.coords
+            codes = numpy.zeros(capacity, dtype=numpy.int32)
+            codes[:self.size] = self.codes
+            names = numpy.zeros(capacity, dtype=self.name_buffer.dtype)
+            names[:self.size] = self.names
+
+            self.coord_buffer, self.code_buffer, self.name_buffer = coords, codes, names
+
+        # Names are widened only if longer names are added
+        if width > self.name_buffer.dtype.itemsize // 4:
+            self.name_buffer = self.name_buffer.astype("U{}".format(width))
+
+        self.update_views()
+
+    def intern(self, descriptions):
+        """
+        Get codes of descriptions, new descriptions are added to code table.
+        """
+        uniques, inverse = numpy.unique(
+            numpy.asarray(descriptions, dtype=str), return_inverse=True)
+
+        lookup = numpy.array([self.code_index.setdefault(i, len(self.code_index))
+            for i in uniques.tolist()], dtype=numpy.int32)
+        self.code_table = list(self.code_index)
+
+        return lookup[inverse.ravel()] if len(uniques) else numpy.zeros(0, numpy.int32)
+
+    @staticmethod
+    def fill(texts, count):
+        """
+        Get a string array of count texts, missing texts are empty.
+        """
+        texts = numpy.asarray(texts, dtype=str).reshape(-1)[:count]
+        if len(texts) < count:
+            texts = numpy.concatenate((texts, numpy.full(count - len(texts), "")))
+
+        return texts
+
+    def append(self, names, coords, descriptions):
+        """
+        Append points and return their rows.
+        """
+        coords = numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 3)
+        count = len(coords)
+        names = self.fill(names, count)
+
+        start = self.size
+        self.reserve(start + count, names.dtype.itemsize // 4)
+        self.coord_buffer[start:start + count] = coords
+        self.name_buffer[start:start + count] = names
+        self.code_buffer[start:start + count] = self.intern(self.fill(descriptions, count))
+
+        self.size += count
+        self.update_views()
+
+        return numpy.arange(start, start + count)
+
+    def patch(self, rows, names=None, coords=None, descriptions=None):
+        """
+        Replace columns of points at rows.
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64).reshape(-1)
+        if coords is not None:
+            self.coords[rows] = numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 3)
+
+        if names is not None:
+            names = self.fill(names, len(rows))
+            self.reserve(self.size, names.dtype.itemsize // 4)
+            self.names[rows] = names
+
+        if descriptions is not None:
+            self.codes[rows] = self.intern(self.fill(descriptions, len(rows)))
+
+    def remove(self, rows):
+        """
+        Remove points at rows.
+        """
+        keep = numpy.ones(self.size, dtype=bool)
+        keep[rows] = False
+        count = int(keep.sum())
+
+        self.coord_buffer[:count] = self.coords[keep]
+        self.name_buffer[:count] = self.names[keep]
+        self.code_buffer[:count] = self.codes[keep]
+
+        self.size = count
+        self.update_views()
+
+    def clear(self):
+        """
+        Remove all points, capacity is kept.
+        """
+        self.size = 0
+        self.code_table = []
+        self.code_index = {}
+        self.update_views()
+
+    def descriptions(self, rows=None):
+        """
+        Get description strings of points.
+        """
+        codes = self.codes if rows is None else self.codes[rows]
+        if not self.code_table: return numpy.full(len(codes), "")
+
+        return numpy.asarray(self.code_table, dtype=str)[codes]
+
+    def take(self, rows):
+        """
+        Create a new table of points at rows.
+        """
+        table = PointTable()
+        table.append(self.names[rows], self.coords[rows], self.descriptions(rows))
+
+        return table
+
+    def georeference(self, origin, rows=None):
+        """
+        Get coordinates relative to a georigin.
+        """
+        coords = self.coords if rows is None else self.coords[rows]
+        return coords - numpy.array(tuple(origin), dtype=numpy.float64)
@@ -101,8 +101,14 @@ class SectionFunctions:
                 values = [edge.valueAt(glp) for glp in params]
                 points.extend(values)
 
-            section_3d = MeshPart.projectPointsOnMesh(
-                points, surface.Mesh, FreeCAD.Vector(0, 0, 1))
+            # Interpolate elevations through Terrain triangle index
+            xy = [(point.x, point.y) for point in points]
+            elevations = surface.Proxy.elevations(surface, xy)
+
+            section_3d = []
+            for point, z in zip(points, elevations.tolist()):
+                if not math.isnan(z):
+                    section_3d.append(FreeCAD.Vector(point.x, point.y, z))
 
             section_2d = self.section_converter(section_3d, origin)
             if not section_2d:
@@ -0,0 +1,93 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides triangle selection functions for Terrain edits."""
+
+import numpy
+
+from .analysis_functions import facet_metrics
+
+
+def points_in_polygon(xy, polygon):
+    """
+    Even-odd test of points in a closed polygon.
+    """
+    xy = numpy.asarray(xy, dtype=numpy.float64).reshape(-1, 2)
+    polygon = numpy.asarray(polygon, dtype=numpy.float64)[:, :2]
+    inside = numpy.zeros(len(xy), dtype=bool)
+
+    # Loop edges, points are tested at once
+    for (x1, y1), (x2, y2) in zip(polygon, numpy.roll(polygon, -1, axis=0)):
+        if y1 == y2: continue
+
+        crossing = (y1 > xy[:, 1]) != (y2 > xy[:, 1])
+        x = x1 + (xy[:, 1] - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crossing & (xy[:, 0] < x)
+
+    return inside
+
+def box_triangles(index, box):
+    """
+    Get rows of triangles with centroids in a box.
+    """
+    xmin, ymin, xmax, ymax = box
+    rows = index.grid.box_candidates(xmin, ymin, xmax, ymax)
+
+    xy = index.points[index.triangles[rows], :2].mean(axis=1)
+    inside = (xy[:, 0] >= xmin) & (xy[:, 0] <= xmax) \
+        & (xy[:, 1] >= ymin) & (xy[:, 1] <= ymax)
+
+    return rows[inside]
+
+def polygon_triangles(index, polygon):
+    """
+    Get rows of triangles with centroids in a polygon.
+    """
+    polygon = numpy.asarray(polygon, dtype=numpy.float64)[:, :2]
+    if len(polygon) < 3: return numpy.zeros(0, dtype=numpy.int64)
+
+    rows = box_triangles(index, (*polygon.min(axis=0), *polygon.max(axis=0)))
+    xy = index.points[index.triangles[rows], :2].mean(axis=1)
+
+    return rows[points_in_polygon(xy, polygon)]
+
+def edge_lengths(points, triangles):
+    """
+    Horizontal length of longest edge of triangles.
+    """
+    xy = points[triangles, :2]
+    edges = xy - numpy.roll(xy, -1, axis=1)
+
+    return numpy.hypot(edges[:, :, 0], edges[:, :, 1]).max(axis=1)
+
+def attribute_triangles(points, triangles, rows, edge=0, slope=0):
+    """
+    Filter rows of triangles longer than edge length or steeper than
+    slope in degrees, zero disables a criterion.
+    """
+    tris = triangles[rows]
+    mask = numpy.zeros(len(rows), dtype=bool)
+
+    if edge: mask |= edge_lengths(points, tris) > edge
+    if slope: mask |= facet_metrics(points, tris)[:, 1] > slope
+
+    return rows[mask]
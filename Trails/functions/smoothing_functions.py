@@ -0,0 +1,92 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides sparse matrix smoothing of Terrain elevations."""
+
+import numpy
+import scipy.sparse
+import scipy.spatial
+
+from .tin_functions import boundary_edges
+
+
+def adjacency(triangles, count):
+    """
+    Create symmetric vertex adjacency matrix of triangles.
+    """
+    edges = triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    rows = numpy.concatenate((edges[:, 0], edges[:, 1]))
+    cols = numpy.concatenate((edges[:, 1], edges[:, 0]))
+
+    matrix = scipy.sparse.csr_matrix(
+        (numpy.ones(len(rows)), (rows, cols)), shape=(count, count))
+
+    # Shared edges are summed, keep them as single links
+    matrix.data[:] = 1
+    return matrix
+
+def umbrella(matrix):
+    """
+    Create row normalized averaging operator of adjacency matrix.
+    """
+    degree = numpy.asarray(matrix.sum(axis=1)).ravel()
+    scale = numpy.divide(1, degree, out=numpy.zeros(len(degree)), where=degree > 0)
+
+    return scipy.sparse.diags(scale) @ matrix
+
+def match_points(points, query, tolerance=1e-6):
+    """
+    Find indexes of points at query XY coordinates.
+    """
+    if len(query) == 0 or len(points) == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+
+    distance, index = scipy.spatial.cKDTree(points[:, :2]).query(query[:, :2])
+    return numpy.unique(index[distance <= tolerance])
+
+def smooth(points, triangles, iterations=10, factor=0.5, method="Taubin",
+    pinned=None, mu=-0.53):
+    """
+    Smooth elevations by Laplacian or Taubin iterations. Boundary and
+    pinned vertices keep their elevations, XY coordinates are kept.
+    """
+    points = points.copy()
+    if len(triangles) == 0 or iterations <= 0:
+        return points
+
+    average = umbrella(adjacency(triangles, len(points)))
+
+    free = numpy.zeros(len(points), dtype=bool)
+    free[numpy.unique(triangles)] = True
+    free[boundary_edges(triangles).ravel()] = False
+    if pinned is not None: free[pinned] = False
+
+    # Taubin alternates shrinking and inflating steps
+    steps = [factor, mu] if method == "Taubin" else [factor]
+
+    z = points[:, 2]
+    for _ in range(iterations):
+        for step in steps:
+            delta = average @ z - z
+            z[free] += step * delta[free]
+
+    return points
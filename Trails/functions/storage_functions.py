@@ -0,0 +1,48 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides binary storage functions for Trails objects."""
+
+import numpy
+import os, tempfile
+
+
+def save(points, triangles):
+    """
+    Write point and triangle arrays to a temporary binary file
+    and return its path.
+    """
+    handle, path = tempfile.mkstemp(suffix=".npz")
+
+    with os.fdopen(handle, "wb") as file:
+        numpy.savez(file,
+            points=numpy.asarray(points, dtype=numpy.float64),
+            triangles=numpy.asarray(triangles, dtype=numpy.int32))
+
+    return path
+
+def load(path):
+    """
+    Read point and triangle arrays from binary file.
+    """
+    with numpy.load(path) as data:
+        return data["points"], data["triangles"]
@@ -25,11 +25,13 @@
 import FreeCAD
 import Mesh, Part
 
-import numpy, copy, math, colorsys
+import numpy
 import scipy.spatial
-import itertools as itools
-from collections import Counter
-from ast import literal_eval
+
+from . import tin_functions, contour_functions, index_functions
+from . import cache_functions, decimation_functions, comparison_functions
+from . import smoothing_functions, selection_functions
+from ..get import get_georigin
 
 
 class DataFunctions:
@@ -45,149 +47,392 @@ class DataFunctions:
         Create 2D Delaunay triangulation.
         """
         # Normalize points
-        base = points[0]
-        nor_points = []
-        for point in points:
-            nor_points.append(point.sub(base))
-
-        data = numpy.array(nor_points) 
+        data = tin_functions.vectors_to_array(points)
+        data -= data[0]
 
         # Create delaunay triangulation
         tri = scipy.spatial.Delaunay(data[:, :2])
-        delaunay = []
 
-        for i in tri.vertices.tolist():
-            delaunay.extend(i)
+        return tri.simplices.astype(numpy.int32)
 
-        return delaunay
+    def update_delaunay(self, points, previous=None, incremental=False,
+            triangle_filter=None, progress=None):
+        """
+        Triangulate Terrain points. When points are a superset of
+        previous points, new ones are inserted into their triangulation.
+        Returns points reordered to start with previous points and
+        triangles. Progress gets percent between steps.
+        """
+        if triangle_filter is None: triangle_filter = self.triangle_filter
+        if progress is None: progress = lambda percent: None
+
+        if previous is None:
+            incremental = False
+        else:
+            previous, triangles = previous
+
+        # Few points added to previous points in any order
+        if incremental and len(triangles) \
+            and len(previous) < len(points) <= 1.25 * len(previous):
+
+            progress(5)
+            order = tin_functions.extend_order(previous, points)
+            progress(30)
+            if order is not None:
+                points = points[order]
+                result = tin_functions.insert_points(
+                    points, triangles, len(previous))
+                progress(80)
+
+                if result is not None:
+                    keep, patch = result
+                    triangle_filter.patch(points, keep, patch)
+                    progress(100)
+                    return points, numpy.vstack((triangles[keep], patch))
+
+        progress(10)
+        triangle_filter.reset()
+        triangles = self.triangulate(points)
+        progress(100)
+
+        return points, triangles
 
     def test_delaunay(self, points, delaunay, lmax, amax):
         """
         Test delaunay for max length and max angle.
         """
-        index = []
-        mesh_index = []
+        if not hasattr(self, "triangle_filter"):
+            self.triangle_filter = tin_functions.TriangleFilter()
 
-        for i in range(0, len(delaunay), 3):
-            first, second,third = delaunay[i:i+3]
+        points = tin_functions.vectors_to_array(points)
+        triangles = tin_functions.triangles_array(delaunay)
+        triangles = self.triangle_filter.filter(points, triangles, lmax, amax)
 
-            p1 = copy.deepcopy(points[first])
-            p2 = copy.deepcopy(points[second])
-            p3 = copy.deepcopy(points[third])
-            p1.z = p2.z = p3.z = 0
+        return self.mesh_from_arrays(points, triangles)
 
-            #Test triangle
-            if self.max_length(lmax, p1, p2, p3)\
-                and self.max_angle(amax,  p1, p2, p3):
-                index.extend([first, second, third])
+    def patch_mesh(self, mesh, points):
+        """
+        Apply facet changes of last point insertion to a copy of mesh.
+        Returns None if mesh does not match the filtered triangulation.
+        """
+        changes = self.triangle_filter.changes
+        self.triangle_filter.changes = None
+        if changes is None: return None
 
-        for i in index:
-            mesh_index.append(points[i])
+        removed, added = changes
+        if mesh.CountFacets != self.triangle_filter.mask.sum() - len(added) + len(removed):
+            return None
 
-        return Mesh.Mesh(mesh_index)
+        mesh = mesh.copy()
+        mesh.removeFacets(removed.tolist())
+        mesh.addFacets([list(map(tuple, i)) for i in points[added].tolist()])
 
+        return mesh
 
     @staticmethod
-    def max_length(lmax, p1, p2, p3):
+    def mesh_from_arrays(points, triangles):
         """
-        Calculation of the 2D length between triangle edges
+        Create mesh from a point array and a triangle index array.
         """
-        # Calculate length between triangle vertices
-        tri = [[p1, p2], [p2, p3], [p3, p1]]
-        for i, j in tri:
-            vec = i.sub(j)
+        if len(triangles) == 0:
+            return Mesh.Mesh()
 
-            # Compare with input
-            if vec.Length > lmax:
-                return False
-        return True
+        points, triangles = tin_functions.compact(points, triangles)
+        return Mesh.Mesh((list(map(tuple, points.tolist())),
+            list(map(tuple, triangles.tolist()))))
 
     @staticmethod
-    def max_angle(amax, p1, p2, p3):
+    def mesh_to_arrays(mesh):
         """
-        Calculation of the 2D angle between triangle edges
+        Get point and triangle index arrays of a mesh.
         """
-        # Calculate angle between triangle vertices
-        tri = [[p1, p2, p3], [p2, p3, p1], [p3, p1, p2]]
-        for j, k, l in tri:
-            vec1 = j.sub(k)
-            vec2 = l.sub(k)
-            radian = vec1.getAngle(vec2)
-            degree = math.degrees(radian)
+        points, facets = mesh.Topology
+        if not facets:
+            return numpy.zeros((0, 3)), numpy.zeros((0, 3), dtype=numpy.int32)
 
-            # Compare with input
-            if degree > amax:
-                return False
-        return True
+        return (tin_functions.vectors_to_array(points),
+            tin_functions.triangles_array(facets))
 
-    def get_contours(self, mesh, major, minor):
+    @staticmethod
+    def make_polygon(coords):
         """
-        Create triangulation contour lines
+        Create polygon wire from a coordinate array.
         """
-        # Find max and min elevation of mesh
-        zmax = mesh.BoundBox.ZMax/1000
-        zmin = mesh.BoundBox.ZMin/1000
+        return Part.makePolygon([FreeCAD.Vector(*i) for i in coords.tolist()])
 
-        # Get point list and create contour points
-        minor_contours = []
-        major_contours = []
+    def contour_groups(self, mesh, major, minor, workers=1, tolerance=0, smooth=False):
+        """
+        Trace major and minor contour coordinates of triangulation,
+        elevation bands are traced in parallel by more than one worker.
+        Contours are simplified within tolerance in mm and smoothed.
+        """
+        points, triangles = self.mesh_to_arrays(mesh)
 
-        delta = minor
-        while delta < zmax:
-            if minor == 0: break
-            cross_sections = mesh.crossSections([((0, 0, delta*1000), (0, 0, 1))], 0.000001)
+        # Trace all levels at once in mm
+        lines = contour_functions.parallel_contour_lines(
+            points, triangles, major*1000, minor*1000, workers)
 
-            for point_list in cross_sections[0]:
-                if len(point_list) > 3:
-                    wire = Part.makePolygon(point_list)
+        return self.finish_contours(lines, tolerance, smooth)
 
-                    if delta % major == 0:
-                        major_contours.append(wire)
-                    else:
-                        minor_contours.append(wire)
+    @staticmethod
+    def finish_contours(lines, tolerance=0, smooth=False):
+        """
+        Simplify and smooth major and minor contour coordinates, short
+        polylines are dropped.
+        """
+        groups = []
+        for group in lines:
+            group = [coords for coords in group if len(coords) > 3]
+            group = contour_functions.simplify_lines(group, tolerance)
+            if smooth: group = contour_functions.smooth_lines(group)
+            groups.append([coords for coords in group if len(coords) > 3])
 
-                    del point_list
+        return groups
+
+    def contour_wires(self, lines, tolerance=0, smooth=False):
+        """
+        Create a wire of each contour polyline after simplifying and
+        smoothing, None for dropped polylines.
+        """
+        finished = contour_functions.simplify_lines(lines, tolerance)
+        if smooth: finished = contour_functions.smooth_lines(finished)
 
-            del cross_sections
-            delta += minor
+        return [self.make_polygon(coords) if len(line) > 3 and len(coords) > 3
+            else None for line, coords in zip(lines, finished)]
 
-        majors = Part.makeCompound(major_contours)
-        minors = Part.makeCompound(minor_contours)
+    def local_contours(self, points, triangles, box, zrange, params):
+        """
+        Update contours after a local edit. Traced polylines are kept
+        with their wires, only polylines of levels in zrange passing
+        through box are replaced. Params are major and minor intervals
+        and tolerance in mm and smoothing.
+        """
+        major, minor, tolerance, smooth = params
+        state = self.contour_state
+
+        # Trace all contours once for new parameters
+        if state is None or state[0] != params:
+            lines = contour_functions.contour_lines(points, triangles, major, minor)
+            state = params, [list(i) for i in lines], \
+                [self.contour_wires(i, tolerance, smooth) for i in lines]
+
+        else:
+            band, *lines = contour_functions.box_contour_lines(
+                points, triangles, major, minor, box, *zrange)
+            zmin, zmax = band[0] * minor - 1e-6, (band[1] - 1) * minor + 1e-6
+
+            for group, new in enumerate(lines):
+                keep = [i for i, line in enumerate(state[1][group])
+                    if not (zmin <= line[0, 2] <= zmax
+                    and contour_functions.line_in_box(line, box))]
+
+                state[1][group] = [state[1][group][i] for i in keep] + new
+                state[2][group] = [state[2][group][i] for i in keep] \
+                    + self.contour_wires(new, tolerance, smooth)
+
+        self.contour_state = state
+        return Part.makeCompound([Part.makeCompound(
+            [wire for wire in wires if wire is not None]) for wires in state[2]])
+
+    def contour_shape(self, groups):
+        """
+        Create contour compound from major and minor coordinates.
+        """
+        majors = Part.makeCompound([self.make_polygon(i) for i in groups[0]])
+        minors = Part.makeCompound([self.make_polygon(i) for i in groups[1]])
 
-        del major_contours, minor_contours
         return Part.makeCompound([majors, minors])
 
+    def get_contours(self, mesh, major, minor):
+        """
+        Create triangulation contour lines
+        """
+        return self.contour_shape(self.contour_groups(mesh, major, minor))
+
+    def boundary_groups(self, mesh):
+        """
+        Trace boundary ring coordinates of triangulation.
+        """
+        points, triangles = self.mesh_to_arrays(mesh)
+        return [[points[ring] for ring in tin_functions.boundary_rings(triangles)]]
+
+    def boundary_shape(self, groups):
+        """
+        Create boundary compound from ring coordinates.
+        """
+        return Part.makeCompound([self.make_polygon(i) for i in groups[0]])
+
     def get_boundary(self, mesh):
         """
         Create triangulation boundary
         """
-        facet_pidx = mesh.Topology[1]
+        return self.boundary_shape(self.boundary_groups(mesh))
 
-        edges = itools.chain(*(itools.permutations(pidx, 2) for pidx in facet_pidx))
-        count = Counter((str(edge) for edge in edges))
+    def get_mesh_key(self, obj):
+        """
+        Get content hash of Terrain mesh, it is recomputed only after
+        mesh changes.
+        """
+        if self.mesh_key is None:
+            points, triangles = self.mesh_to_arrays(obj.Mesh)
+            self.mesh_key = cache_functions.array_key(points, triangles)
+
+        return self.mesh_key
+
+    def cached_shape(self, obj, name, trace, build, *params):
+        """
+        Get a derived shape of Terrain mesh from memory cache, then from
+        disk cache and trace its coordinates only if both of them miss.
+        """
+        key = cache_functions.shape_key(name, self.get_mesh_key(obj), *params)
+
+        shape = self.shape_cache.get(key)
+        if shape is not None: return shape
+
+        disk = self.is_disk_cached(obj)
+        groups = self.disk_cache.get(key) if disk else None
 
-        double_boundary = list((literal_eval(k) for k, v in count.items() if v == 1))
+        if groups is None:
+            groups = trace()
+            if disk: self.disk_cache.put(key, groups)
 
-        boundary = double_boundary[:1]
-        for candidate in double_boundary[1:]:
-            if candidate in boundary or candidate[::-1] in boundary:
-                pass
-            else:
-                boundary.append(candidate)
+        shape = build(groups)
+        self.shape_cache.put(key, shape)
 
-        def mkEdge(p1, p2):
-            return Part.makeLine((p1.x, p1.y, p1.z), (p2.x, p2.y, p2.z))
+        return shape
 
-        points = mesh.Points
-        edges = []
-        for p1, p2 in boundary:
-            edges.append(mkEdge(points[p1], points[p2]))
+    def decimation(self, tolerance, target=0):
+        """
+        Get a work which decimates Terrain triangulation to a maximum
+        vertical error in mm. It uses Terrain arrays taken here, so it
+        can run in a background job. Work returns points, triangles,
+        maximum error and RMS error.
+        """
+        points, triangles = self.points, self.triangles
 
-        wires = []
-        for opening in Part.sortEdges(edges):
-            wires.append(Part.Wire(opening))
+        def work(progress=None):
+            if len(triangles) == 0:
+                return points, triangles, 0, 0
 
-        return Part.makeCompound(wires)
+            return decimation_functions.decimate(
+                points, triangles, tolerance, target, progress)
+
+        return work
+
+    def surface_arrays(self, obj):
+        """
+        Get point and triangle arrays of Terrain mesh, edit session
+        arrays are used while editing as their rows follow mesh facets.
+        """
+        session = getattr(self, "session", None)
+        if session is not None: return session.points, session.triangles
+
+        return self.mesh_to_arrays(obj.Mesh)
+
+    def get_analysis(self, obj):
+        """
+        Get facet analysis of Terrain mesh, metrics are calculated once
+        for each mesh.
+        """
+        if self.pipeline.is_dirty("analysis"):
+            points, triangles = self.surface_arrays(obj)
+            self.pipeline.run(
+                "analysis", self.facet_analysis.update, points, triangles)
+
+        return self.facet_analysis
+
+    def get_index(self, obj):
+        """
+        Get triangle index of Terrain mesh, it is rebuilt only after
+        mesh changes.
+        """
+        if self.triangle_index is None:
+            points, triangles = self.surface_arrays(obj)
+            if len(triangles) == 0: return None
+
+            self.triangle_index = index_functions.TriangleIndex(points, triangles)
+
+        return self.triangle_index
+
+    def select_triangles(self, obj, box=None, polygon=None, edge=0, slope=0):
+        """
+        Get mesh facet indexes with centroids in a box or polygon, they
+        are filtered by edge length or slope if given.
+        """
+        index = self.get_index(obj)
+        if index is None: return numpy.zeros(0, dtype=numpy.int64)
+
+        if polygon is not None:
+            rows = selection_functions.polygon_triangles(index, polygon)
+        elif box is not None:
+            rows = selection_functions.box_triangles(index, box)
+        else:
+            rows = numpy.arange(len(index.triangles))
+
+        if edge or slope:
+            rows = selection_functions.attribute_triangles(
+                index.points, index.triangles, rows, edge, slope)
+
+        return rows
+
+    def smooth(self, iterations=10, method="Taubin", pinned=None):
+        """
+        Smooth Terrain elevations, boundary points and points at pinned
+        coordinates are kept. Returns smoothed points.
+        """
+        index = None
+        if pinned is not None:
+            index = smoothing_functions.match_points(self.points, pinned)
+
+        return smoothing_functions.smooth(self.points, self.triangles,
+            iterations, method=method, pinned=index)
+
+    def compare(self, obj, other, spacing):
+        """
+        Compare Terrain with another Terrain on a grid of spacing in mm.
+        Returns cut, fill and net volumes in mm3 where other Terrain is
+        below or above, isopach points and triangles.
+        """
+        base = self.get_index(obj)
+        comparison = other.Proxy.get_index(other)
+        if base is None or comparison is None:
+            return 0, 0, 0, numpy.zeros((0, 3)), numpy.zeros((0, 3), dtype=numpy.int32)
+
+        # Overlap of both meshes
+        box1, box2 = obj.Mesh.BoundBox, other.Mesh.BoundBox
+        bounds = (max(box1.XMin, box2.XMin), max(box1.YMin, box2.YMin),
+            min(box1.XMax, box2.XMax), min(box1.YMax, box2.YMax))
+
+        cut, fill, net, points, triangles = comparison_functions.compare_surfaces(
+            base, comparison, bounds, spacing)
+
+        # Isopach points in Terrain coordinates
+        origin = get_georigin.get().Origin
+        points[:, :2] += numpy.array([origin.x, origin.y])
+
+        return cut, fill, net, points, triangles
+
+    def triangle_at(self, obj, xy):
+        """
+        Get mesh facet indexes at XY points in mesh coordinates,
+        -1 for points outside of Terrain.
+        """
+        index = self.get_index(obj)
+        if index is None:
+            return numpy.full(len(xy), -1, dtype=numpy.int64)
+
+        return index.triangle_at(xy)
+
+    def elevations(self, obj, xy):
+        """
+        Get Terrain elevations at XY points in mesh coordinates,
+        nan for points outside of Terrain.
+        """
+        index = self.get_index(obj)
+        if index is None:
+            return numpy.full(len(xy), numpy.nan)
+
+        return index.elevations(xy)
 
 
 class ViewFunctions:
@@ -216,57 +461,9 @@ class ViewFunctions:
         del copy_shape
         return points, vertices
 
-    def elevation_analysis(self, mesh, ranges):
-        max = mesh.BoundBox.ZMax
-        min = mesh.BoundBox.ZMin
-
-        colorlist = []
-        for facet in mesh.Facets:
-            z = facet.Points[0][2] + facet.Points[1][2] + facet.Points[2][2]
-
-            hue = 1
-            elevations = numpy.arange(min, max, (max-min)/ranges)
-            for i in elevations:
-                if z/3 < i: 
-                    hue = i/(max-min)
-                    break
-
-            colorlist.append(colorsys.hls_to_rgb(hue, 0.5, 0.5))
-        return colorlist
-
-    def slope_analysis(self, mesh, ranges):
-        colorlist = []
-        for facet in mesh.Facets:
-            normal = facet.Normal
-            angle = math.degrees(normal.getAngle(FreeCAD.Vector(0, 0, 1))*2)
-
-            hue = 1
-            slopes = numpy.arange(0.0, 90.0, 90.0/ranges)
-            for i in slopes:
-                if angle < i: 
-                    hue = i/90.0
-                    break
-
-            colorlist.append(colorsys.hls_to_rgb(hue, 0.5, 0.5))
-        return colorlist
-
-    def direction_analysis(self, mesh, ranges):
-        colorlist = []
-        for facet in mesh.Facets:
-            normal = copy.deepcopy(facet.Normal)
-            normal.z = 0
-            anglex = math.degrees(normal.getAngle(FreeCAD.Vector(1, 0, 0)))
-            angley = math.degrees(normal.getAngle(FreeCAD.Vector(0, 1, 0)))
-
-            if angley >= 90:
-                anglex = 360.0 - anglex
-
-            hue = 0.0
-            directions = numpy.arange(0.0, 360.0, 360.0/ranges)
-            for i in directions:
-                if anglex < i + directions[1]/2: 
-                    hue = i/360.0
-                    break
-
-            colorlist.append(colorsys.hls_to_rgb(hue, 0.5, 0.5))
-        return colorlist
+    def analysis_colors(self, obj, analysis_type, ranges):
+        """
+        Get facet colors of Terrain analysis.
+        """
+        analysis = obj.Proxy.get_analysis(obj)
+        return analysis.colors(analysis_type, ranges).tolist()
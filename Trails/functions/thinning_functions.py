@@ -0,0 +1,147 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides point thinning functions to reduce Terrain points before triangulation."""
+
+import numpy
+import scipy.spatial
+
+
+def grid_cells(points, size):
+    """
+    Get grid cell index of each point, cells are numbered by their
+    order of first appearance.
+    """
+    ij = numpy.floor((points[:, :2] - points[:, :2].min(axis=0)) / size).astype(numpy.int64)
+    codes = ij[:, 0] * (ij[:, 1].max() + 1) + ij[:, 1]
+    _, cells = numpy.unique(codes, return_inverse=True)
+
+    return cells.ravel()
+
+def grid_thin(points, size, mode="Mean"):
+    """
+    Keep one point for each grid cell. Minimum and Maximum modes keep
+    the lowest or highest point of cell, Mean mode averages cell points.
+    """
+    if len(points) == 0 or size <= 0:
+        return points
+
+    cells = grid_cells(points, size)
+    count = cells.max() + 1
+
+    if mode == "Mean":
+        weights = numpy.bincount(cells, minlength=count)
+        result = numpy.empty((count, 3))
+        for i in range(3):
+            result[:, i] = numpy.bincount(cells, points[:, i], count) / weights
+        return result
+
+    # Points of each cell sorted by elevation
+    order = numpy.lexsort((points[:, 2], cells))
+    sorted_cells = cells[order]
+    first = numpy.flatnonzero(numpy.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+
+    if mode == "Minimum":
+        return points[order[first]]
+
+    last = numpy.r_[first[1:], len(order)] - 1
+    return points[order[last]]
+
+def tolerance_thin(points, tolerance, size=None):
+    """
+    Keep only points which change the surface more than tolerance.
+    Starts from the highest point of each grid cell and convex hull,
+    then adds the worst point of each triangle above tolerance until
+    every dropped point is within tolerance of the triangulation.
+    """
+    if len(points) < 4 or tolerance <= 0:
+        return points
+
+    xy = points[:, :2] - points[:, :2].mean(axis=0)
+    z = points[:, 2]
+
+    # Collinear points have no surface to thin
+    try:
+        hull = scipy.spatial.ConvexHull(xy)
+    except scipy.spatial.QhullError:
+        return points
+
+    # Coarse start with about one point per hundred
+    if not size or size <= 0:
+        span = numpy.ptp(xy, axis=0).prod()
+        size = numpy.sqrt(span * 100 / len(points)) if span > 0 else 1
+
+    keep = numpy.zeros(len(points), dtype=bool)
+    keep[hull.vertices] = True
+
+    cells = grid_cells(points, size)
+    order = numpy.lexsort((z, cells))
+    sorted_cells = cells[order]
+    last = numpy.flatnonzero(numpy.r_[sorted_cells[1:] != sorted_cells[:-1], True])
+    keep[order[last]] = True
+
+    while True:
+        kept = numpy.flatnonzero(keep)
+        rest = numpy.flatnonzero(~keep)
+        if len(rest) == 0: break
+
+        tri = scipy.spatial.Delaunay(xy[kept])
+        simplex = tri.find_simplex(xy[rest])
+        inside = simplex >= 0
+        rest, simplex = rest[inside], simplex[inside]
+
+        # Barycentric interpolation of dropped points
+        transform = tri.transform[simplex]
+        bary = numpy.einsum('ijk,ik->ij', transform[:, :2], xy[rest] - transform[:, 2])
+        weights = numpy.c_[bary, 1 - bary.sum(axis=1)]
+        surface = (z[kept][tri.simplices[simplex]] * weights).sum(axis=1)
+        error = numpy.abs(z[rest] - surface)
+
+        above = error > tolerance
+        if not above.any(): break
+
+        # Worst point of each triangle
+        rest, simplex, error = rest[above], simplex[above], error[above]
+        order = numpy.lexsort((error, simplex))
+        sorted_simplex = simplex[order]
+        last = numpy.flatnonzero(numpy.r_[sorted_simplex[1:] != sorted_simplex[:-1], True])
+        keep[rest[order[last]]] = True
+
+    return points[keep]
+
+def thin(points, method, size, tolerance):
+    """
+    Thin points by method, returns kept points.
+    """
+    if method == "Grid Minimum":
+        return grid_thin(points, size, "Minimum")
+
+    if method == "Grid Mean":
+        return grid_thin(points, size, "Mean")
+
+    if method == "Grid Maximum":
+        return grid_thin(points, size, "Maximum")
+
+    if method == "Z Tolerance":
+        return tolerance_thin(points, tolerance, size)
+
+    return points
@@ -0,0 +1,314 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides array based functions for Terrain triangulations."""
+
+import numpy
+import scipy.spatial
+
+from .index_functions import TriangleIndex
+
+
+def vectors_to_array(vectors, base=None):
+    """
+    Convert a vector list to a float64 Nx3 array and reduce it by base.
+    """
+    data = numpy.array(vectors, dtype=numpy.float64).reshape(-1, 3)
+
+    if base is not None:
+        data -= numpy.array(tuple(base), dtype=numpy.float64)
+
+    return data
+
+def triangles_array(delaunay):
+    """
+    Convert a flat Delaunay index list to an int32 Mx3 array.
+    """
+    return numpy.asarray(delaunay, dtype=numpy.int32).reshape(-1, 3)
+
+def triangle_metrics(points, triangles):
+    """
+    Calculate 2D maximum edge length and maximum interior angle
+    (degrees) of each triangle. Returns a Mx2 array.
+    """
+    xy = points[:, :2]
+    p1 = xy[triangles[:, 0]]
+    p2 = xy[triangles[:, 1]]
+    p3 = xy[triangles[:, 2]]
+
+    # Edge vectors and 2D lengths
+    e1 = p2 - p1
+    e2 = p3 - p2
+    e3 = p1 - p3
+    l1 = numpy.hypot(e1[:, 0], e1[:, 1])
+    l2 = numpy.hypot(e2[:, 0], e2[:, 1])
+    l3 = numpy.hypot(e3[:, 0], e3[:, 1])
+
+    metrics = numpy.empty((len(triangles), 2), dtype=numpy.float64)
+    metrics[:, 0] = numpy.maximum(numpy.maximum(l1, l2), l3)
+
+    # Interior angles from the edges that meet at each vertex
+    def angle(u, v, lu, lv):
+        length = lu * lv
+        dot = numpy.einsum('ij,ij->i', u, v)
+        cos = numpy.divide(dot, length,
+            out=numpy.ones_like(dot), where=length > 0)
+        return numpy.degrees(numpy.arccos(numpy.clip(cos, -1.0, 1.0)))
+
+    a1 = angle(e1, -e3, l1, l3)
+    a2 = angle(e2, -e1, l2, l1)
+    a3 = angle(e3, -e2, l3, l2)
+    metrics[:, 1] = numpy.maximum(numpy.maximum(a1, a2), a3)
+
+    return metrics
+
+def triangle_mask(metrics, lmax, amax):
+    """
+    Return a boolean mask of triangles within max length and max angle.
+    """
+    return (metrics[:, 0] <= lmax) & (metrics[:, 1] <= amax)
+
+def compact(points, triangles):
+    """
+    Drop points which are not used by any triangle and reindex triangles.
+    """
+    used, inverse = numpy.unique(triangles, return_inverse=True)
+    return points[used], inverse.reshape(-1, 3).astype(numpy.int32)
+
+def extend_order(previous, points):
+    """
+    Find an order of points which starts with previous points. Returns
+    None if points are not a superset of previous points.
+    """
+    rows, inverse = numpy.unique(
+        numpy.vstack((previous, points)), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    lookup = numpy.full(len(rows), -1)
+    lookup[inverse[len(previous):]] = numpy.arange(len(points))
+    order = lookup[inverse[:len(previous)]]
+
+    # Every previous point must match a distinct point
+    if (order < 0).any() or len(numpy.unique(order)) < len(order):
+        return None
+
+    used = numpy.zeros(len(points), dtype=bool)
+    used[order] = True
+
+    return numpy.concatenate((order, numpy.flatnonzero(~used)))
+
+def boundary_edges(triangles):
+    """
+    Find boundary edges which belong to only one triangle.
+    """
+    edges = triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2).astype(numpy.int64)
+    lo = edges.min(axis=1)
+    hi = edges.max(axis=1)
+
+    # Sorted edge keys of shared edges are repeated
+    _, inverse, counts = numpy.unique(
+        lo * (int(triangles.max()) + 1) + hi,
+        return_inverse=True, return_counts=True)
+
+    return edges[counts[inverse.ravel()] == 1]
+
+def boundary_rings(triangles):
+    """
+    Link boundary edges into closed rings of vertex indices.
+    Outer boundaries, holes and islands give separate rings.
+    """
+    if len(triangles) == 0:
+        return []
+
+    edges = boundary_edges(triangles)
+    vertices, segments = numpy.unique(edges, return_inverse=True)
+    rings = chain_segments(segments.reshape(-1, 2), len(vertices))
+
+    return [vertices[ring] for ring in rings]
+
+def chain_segments(segments, node_count):
+    """
+    Chain segments into polylines of node indices by an endpoint map.
+    Open polylines start from end nodes, closed ones repeat first node.
+    """
+    # Endpoint map of node to incident segments
+    ends = segments.ravel()
+    order = numpy.argsort(ends, kind='stable')
+    indptr = numpy.zeros(node_count + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(ends, minlength=node_count), out=indptr[1:])
+
+    incident = (order // 2).tolist()
+    indptr = indptr.tolist()
+    seg_nodes = segments.tolist()
+    used = bytearray(len(seg_nodes))
+
+    def walk(node):
+        polyline = [node]
+        while True:
+            for i in range(indptr[node], indptr[node + 1]):
+                seg = incident[i]
+                if not used[seg]: break
+            else:
+                return polyline
+
+            used[seg] = 1
+            first, second = seg_nodes[seg]
+            node = second if first == node else first
+            polyline.append(node)
+
+    polylines = []
+
+    # Open polylines start from nodes with odd degree
+    for node in range(node_count):
+        if (indptr[node + 1] - indptr[node]) % 2:
+            polyline = walk(node)
+            if len(polyline) > 1: polylines.append(polyline)
+
+    # Remaining segments form closed polylines
+    for seg, (first, second) in enumerate(seg_nodes):
+        if not used[seg]:
+            polylines.append(walk(first))
+
+    return polylines
+
+def circumcircles(points, triangles):
+    """
+    Calculate 2D circumcircle centers and squared radii of triangles.
+    Degenerate triangles get infinite radius.
+    """
+    a = points[triangles[:, 0], :2]
+    b = points[triangles[:, 1], :2] - a
+    c = points[triangles[:, 2], :2] - a
+
+    d = 2 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+    b2 = (b * b).sum(axis=1)
+    c2 = (c * c).sum(axis=1)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ux = (c[:, 1] * b2 - b[:, 1] * c2) / d
+        uy = (b[:, 0] * c2 - c[:, 0] * b2) / d
+
+    centers = a + numpy.column_stack((ux, uy))
+    radii = ux * ux + uy * uy
+    radii[~numpy.isfinite(radii)] = numpy.inf
+
+    return centers, radii
+
+def insert_points(points, triangles, start):
+    """
+    Insert points from start index into the Delaunay triangulation of
+    previous points (Bowyer-Watson). Only triangles whose circumcircle
+    contains a new point are retriangulated. Returns mask of kept
+    triangles and new triangles, or None if a point is outside of
+    triangulation.
+    """
+    new = points[start:, :2]
+    centers, radii = circumcircles(points, triangles)
+
+    # Circumcircles which reach bounding box of new points
+    nearest = numpy.clip(centers, new.min(axis=0), new.max(axis=0))
+    candidates = numpy.flatnonzero(((centers - nearest)**2).sum(axis=1) < radii)
+
+    # Cavity triangles contain a new point in their circumcircle
+    distances, _ = scipy.spatial.cKDTree(new).query(centers[candidates])
+    bad = numpy.zeros(len(triangles), dtype=bool)
+    bad[candidates[distances**2 < radii[candidates]]] = True
+
+    # Each new point must be in a cavity triangle
+    cavity = TriangleIndex(points, triangles[bad])
+    if (cavity.triangle_at(new) < 0).any():
+        return None
+
+    # Retriangulate cavity vertices and new points
+    vertices = numpy.union1d(
+        triangles[bad].ravel(), numpy.arange(start, len(points)))
+    local = points[vertices, :2]
+    tri = scipy.spatial.Delaunay(local - local[0])
+    patch = vertices[tri.simplices].astype(numpy.int32)
+
+    # Keep new triangles inside of cavity
+    centroids = points[patch, :2].mean(axis=1)
+    patch = patch[cavity.triangle_at(centroids) >= 0]
+
+    return ~bad, patch
+
+
+class TriangleFilter:
+    """
+    Keep triangle metrics of a triangulation to re-threshold it
+    without recalculating them.
+    """
+
+    def __init__(self):
+        self.triangles = None
+        self.metrics = None
+        self.mask = None
+        self.limits = None
+        self.changes = None
+
+    def reset(self):
+        """
+        Forget cached metrics when points change.
+        """
+        self.triangles = None
+        self.metrics = None
+        self.mask = None
+        self.limits = None
+        self.changes = None
+
+    def patch(self, points, keep, triangles):
+        """
+        Drop metrics of removed triangles and add metrics of new ones.
+        Facet changes of last filtered triangulation are kept to patch
+        its mesh.
+        """
+        self.changes = None
+        if self.metrics is None or len(self.metrics) != len(keep):
+            return
+
+        metrics = triangle_metrics(points, triangles)
+        self.triangles = numpy.vstack((self.triangles[keep], triangles))
+        self.metrics = numpy.vstack((self.metrics[keep], metrics))
+
+        if self.mask is not None:
+            # Mesh facets follow order of filtered triangles
+            facets = numpy.cumsum(self.mask) - 1
+            added = triangle_mask(metrics, *self.limits)
+
+            self.changes = facets[~keep & self.mask], triangles[added]
+            self.mask = numpy.concatenate((self.mask[keep], added))
+
+    def filter(self, points, triangles, lmax, amax):
+        """
+        Return triangles within max length and max angle.
+        """
+        # Metrics are only valid for the same triangulation
+        if self.metrics is None \
+            or not numpy.array_equal(self.triangles, triangles):
+            self.triangles = triangles
+            self.metrics = triangle_metrics(points, triangles)
+
+        self.mask = triangle_mask(self.metrics, lmax, amax)
+        self.limits = lmax, amax
+        self.changes = None
+
+        return triangles[self.mask]
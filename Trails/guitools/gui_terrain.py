@@ -27,6 +27,7 @@ import FreeCAD, FreeCADGui
 from trails_variables import icons_path
 from ..make import make_terrain
 from ..get import get_clusters
+from ..tasks.task_job import JobRunner
 
 
 class CreateTerrain:
@@ -38,7 +39,7 @@ class CreateTerrain:
         """
         Constructor
         """
-        pass
+        self.runner = JobRunner("Triangulating Terrain")
 
     def GetResources(self):
         """
@@ -77,6 +78,21 @@ class CreateTerrain:
 
             terrain.Clusters = pgs
 
+        # Points are triangulated in background, Terrain is set on finish
+        if terrain.Proxy.pipeline.is_dirty("triangulation") and self.runner.start(
+                lambda job, work: work(job.report),
+                lambda result: self.finish(terrain, result),
+                terrain.Proxy.triangulation(terrain)):
+            return
+
+        FreeCAD.ActiveDocument.recompute()
+
+    @staticmethod
+    def finish(terrain, result):
+        """
+        Set triangulation result and build Terrain products.
+        """
+        terrain.Proxy.set_triangulation(terrain, result)
         FreeCAD.ActiveDocument.recompute()
 
 FreeCADGui.addCommand('Create Terrain', CreateTerrain())
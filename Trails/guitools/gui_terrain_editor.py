@@ -24,8 +24,13 @@
 
 import FreeCAD, FreeCADGui
 from pivy import coin
+from PySide2 import QtWidgets
+import numpy
 
 from trails_variables import icons_path
+from ..make import make_terrain
+from ..tasks.task_job import JobRunner
+from ..get import get_georigin
 
 
 class AddPoint:
@@ -103,10 +108,12 @@ class AddPoint:
                         obj = self.view.getObjectInfo(self.view.getCursorPos())
                         curpos = FreeCAD.Vector(float(obj["x"]),float(obj["y"]),float(obj["z"]))           
 
+                        # Picked position is displaced by georigin
+                        curpos = curpos.sub(get_georigin.get().Origin)
+
                         terrain = FreeCADGui.Selection.getSelection()[-1]
-                        copy_mesh = terrain.Mesh.copy()
-                        copy_mesh.insertVertex(index, curpos)
-                        terrain.Mesh = copy_mesh
+                        terrain.Proxy.edit(terrain, "add_point",
+                            index, (curpos.x, curpos.y, curpos.z))
 
 FreeCADGui.addCommand('Add Point', AddPoint())
 
@@ -235,14 +242,160 @@ class DeleteTriangle:
                 and event.getState() == coin.SoKeyboardEvent.DOWN:
 
                 terrain = FreeCADGui.Selection.getSelection()[-1]
-                copy_mesh = terrain.Mesh.copy()
-                copy_mesh.removeFacets(self.indexes)
+                terrain.Proxy.edit(terrain, "delete_triangles", self.indexes)
                 self.indexes.clear()
-                terrain.Mesh = copy_mesh
 
 FreeCADGui.addCommand('Delete Triangle', DeleteTriangle())
 
 
+class RemoveTriangles:
+    """
+    Command to remove triangles of Terrain in an area or by attributes.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        pass
+
+    def GetResources(self):
+        """
+        Return the command resources dictionary
+        """
+        return {
+            'Pixmap': icons_path + '/DeleteTriangle.svg',
+            'MenuText': "Remove Triangles",
+            'ToolTip': "Remove triangles of selected Terrain in a box or lasso,"
+                " or longer or steeper than given limits."
+            }
+
+    def IsActive(self):
+        """
+        Define tool button activation situation
+        """
+        # Check for document
+        if FreeCAD.ActiveDocument:
+            # Check for selected object
+            selection = FreeCADGui.Selection.getSelection()
+            if selection:
+                if selection[-1].Proxy.Type == 'Trails::Terrain':
+                    return True
+        return False
+
+    def Activated(self):
+        """
+        Command activation method
+        """
+        self.terrain = FreeCADGui.Selection.getSelection()[-1]
+        self.mode, ok = QtWidgets.QInputDialog.getItem(None, "Remove Triangles",
+            "Select by:", ["Box", "Lasso", "Attributes"], 0, False)
+        if not ok: return
+
+        # Limits are applied in box and lasso too, zero disables them
+        edge, ok = QtWidgets.QInputDialog.getDouble(None, "Remove Triangles",
+            "Longer edge than (m), 0 for any:", 0, 0, 1e6, 3)
+        if not ok: return
+
+        slope, ok = QtWidgets.QInputDialog.getDouble(None, "Remove Triangles",
+            "Steeper than (degree), 0 for any:", 0, 0, 90, 2)
+        if not ok: return
+
+        self.limits = edge * 1000, slope
+        if self.mode == "Attributes":
+            self.remove()
+            return
+
+        # Draw clicked polygon while picking
+        self.polygon = []
+        self.coords = coin.SoCoordinate3()
+        self.lines = coin.SoLineSet()
+        self.outline = coin.SoSeparator()
+        self.outline.addChild(self.coords)
+        self.outline.addChild(self.lines)
+
+        self.view = FreeCADGui.ActiveDocument.ActiveView
+        self.view.getSceneGraph().addChild(self.outline)
+        self.event_callback = self.view.addEventCallbackPivy(
+            coin.SoButtonEvent.getClassTypeId(), self.pick)
+
+    def pick(self, cb):
+        """
+        Take corners of box or lasso by mouse clicks, Enter closes lasso
+        and Escape cancels.
+        """
+        event = cb.getEvent()
+
+        if event.getTypeId().isDerivedFrom(coin.SoKeyboardEvent.getClassTypeId()):
+            if event.getState() != coin.SoKeyboardEvent.DOWN: return
+
+            if event.getKey() == coin.SoKeyboardEvent.ESCAPE:
+                self.finish()
+
+            elif event.getKey() == coin.SoKeyboardEvent.RETURN:
+                self.finish()
+                self.remove()
+
+        elif event.getTypeId().isDerivedFrom(coin.SoMouseButtonEvent.getClassTypeId()):
+            if event.getButton() == coin.SoMouseButtonEvent.BUTTON1 \
+                and event.getState() == coin.SoMouseButtonEvent.DOWN:
+                point = self.view.getPoint(self.view.getCursorPos())
+                self.polygon.append((point.x, point.y, point.z))
+
+                outline = self.polygon
+                if self.mode == "Box" and len(outline) == 2:
+                    (x1, y1, z), (x2, y2, _) = outline
+                    outline = [(x1, y1, z), (x2, y1, z), (x2, y2, z), (x1, y2, z)]
+
+                outline = outline + outline[:1]
+                self.coords.point.setValues(0, len(outline), outline)
+                self.coords.point.setNum(len(outline))
+                self.lines.numVertices.setValue(len(outline))
+
+                if self.mode == "Box" and len(self.polygon) == 2:
+                    self.finish()
+                    self.remove()
+
+    def finish(self):
+        """
+        Remove outline and event callback.
+        """
+        self.view.removeEventCallbackPivy(
+            coin.SoButtonEvent.getClassTypeId(), self.event_callback)
+        self.view.getSceneGraph().removeChild(self.outline)
+
+    def remove(self):
+        """
+        Remove selected triangles in one edit.
+        """
+        box, polygon = None, None
+        if self.mode != "Attributes":
+            # Picked points are displaced by georigin
+            area = numpy.array(self.polygon)[:, :2] \
+                - numpy.array(tuple(get_georigin.get().Origin))[:2]
+
+            if self.mode == "Box":
+                if len(area) < 2: return
+                box = (*area.min(axis=0), *area.max(axis=0))
+            else:
+                if len(area) < 3: return
+                polygon = area
+
+        rows = self.terrain.Proxy.select_triangles(
+            self.terrain, box, polygon, *self.limits)
+        if len(rows) == 0:
+            print("There is no triangle to remove")
+            return
+
+        answer = QtWidgets.QMessageBox.question(None, "Remove Triangles",
+            "Remove {} triangles?".format(len(rows)))
+        if answer != QtWidgets.QMessageBox.Yes: return
+
+        self.terrain.Proxy.edit(self.terrain, "delete_triangles", rows)
+
+FreeCADGui.addCommand('Remove Triangles', RemoveTriangles())
+
+
 class SwapEdge:
     """
     Command to swap an edge between two triangles
@@ -320,22 +473,107 @@ class SwapEdge:
                         # try to swap edge between picked triangle
                         if len(self.face_indexes) == 2:
                             terrain = FreeCADGui.Selection.getSelection()[-1]
-                            copy_mesh = terrain.Mesh.copy()
+                            delta = terrain.Proxy.edit(terrain, "swap_edge",
+                                self.face_indexes[0], self.face_indexes[1])
 
-                            try:
-                                copy_mesh.swapEdge(
-                                    self.face_indexes[0], self.face_indexes[1])
-
-                            except Exception:
+                            if delta is None:
                                 print("The edge between these triangles cannot be swappable")
 
-                            terrain.Mesh = copy_mesh
                             self.face_indexes.clear()
-                            FreeCAD.ActiveDocument.recompute()
 
 FreeCADGui.addCommand('Swap Edge', SwapEdge())
 
 
+class UndoTerrainEdit:
+    """
+    Command to revert last edit of Terrain.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        pass
+
+    def GetResources(self):
+        """
+        Return the command resources dictionary
+        """
+        return {
+            'Pixmap': icons_path + '/EditSurface.svg',
+            'MenuText': "Undo Terrain Edit",
+            'ToolTip': "Revert last point or triangle edit of selected Terrain."
+            }
+
+    def IsActive(self):
+        """
+        Define tool button activation situation
+        """
+        # Check for document
+        if FreeCAD.ActiveDocument:
+            # Check for selected object
+            selection = FreeCADGui.Selection.getSelection()
+            if selection:
+                if selection[-1].Proxy.Type == 'Trails::Terrain':
+                    return True
+        return False
+
+    def Activated(self):
+        """
+        Command activation method
+        """
+        terrain = FreeCADGui.Selection.getSelection()[-1]
+        if terrain.Proxy.undo_edit(terrain) is None:
+            print("There is no edit to undo")
+
+FreeCADGui.addCommand('Undo Terrain Edit', UndoTerrainEdit())
+
+
+class RedoTerrainEdit:
+    """
+    Command to apply last reverted edit of Terrain.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        pass
+
+    def GetResources(self):
+        """
+        Return the command resources dictionary
+        """
+        return {
+            'Pixmap': icons_path + '/EditSurface.svg',
+            'MenuText': "Redo Terrain Edit",
+            'ToolTip': "Apply last reverted edit of selected Terrain."
+            }
+
+    def IsActive(self):
+        """
+        Define tool button activation situation
+        """
+        # Check for document
+        if FreeCAD.ActiveDocument:
+            # Check for selected object
+            selection = FreeCADGui.Selection.getSelection()
+            if selection:
+                if selection[-1].Proxy.Type == 'Trails::Terrain':
+                    return True
+        return False
+
+    def Activated(self):
+        """
+        Command activation method
+        """
+        terrain = FreeCADGui.Selection.getSelection()[-1]
+        if terrain.Proxy.redo_edit(terrain) is None:
+            print("There is no edit to redo")
+
+FreeCADGui.addCommand('Redo Terrain Edit', RedoTerrainEdit())
+
+
 class SmoothTerrain:
     """
     Command to smooth Terrain.
@@ -350,7 +588,7 @@ class SmoothTerrain:
         self.resources = {
             'Pixmap': icons_path + '/SmoothSurface.svg',
             'MenuText': "Smooth Terrain",
-            'ToolTip': "Smooth selected Terrain."
+            'ToolTip': "Smooth selected Terrain, points of selected Clusters are kept."
             }
 
     def GetResources(self):
@@ -377,8 +615,101 @@ class SmoothTerrain:
         """
         Command activation method
         """
-        # Get selected terrain and smooth it
-        terrain = FreeCADGui.Selection.getSelection()[0]
-        terrain.Mesh.smooth()
+        # Get selected terrain, points of selected clusters are pinned
+        selection = FreeCADGui.Selection.getSelection()
+        terrain = selection[-1]
+        pinned = [obj.Proxy.table.coords
+            for obj in selection[:-1] if obj.Proxy.Type == 'Trails::Cluster']
+
+        method, ok = QtWidgets.QInputDialog.getItem(
+            None, "Smooth Terrain", "Method:", ["Taubin", "Laplacian"], 0, False)
+        if not ok: return
+
+        iterations, ok = QtWidgets.QInputDialog.getInt(
+            None, "Smooth Terrain", "Iterations:", 10, 1, 1000)
+        if not ok: return
+
+        points = terrain.Proxy.smooth(iterations, method,
+            numpy.vstack(pinned) if pinned else None)
+
+        terrain.Proxy.set_surface(terrain, points, terrain.Proxy.triangles)
+        FreeCAD.ActiveDocument.recompute()
 
 FreeCADGui.addCommand('Smooth Terrain', SmoothTerrain())
+
+
+class DecimateTerrain:
+    """
+    Command to decimate Terrain to a maximum vertical error.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+
+        # Set icon,  menu text and tooltip
+        self.resources = {
+            'Pixmap': icons_path + '/EditSurface.svg',
+            'MenuText': "Decimate Terrain",
+            'ToolTip': "Remove points of selected Terrain within a vertical error."
+            }
+        self.runner = JobRunner("Decimating Terrain")
+
+    def GetResources(self):
+        """
+        Return the command resources dictionary
+        """
+        return self.resources
+
+    def IsActive(self):
+        """
+        Define tool button activation situation
+        """
+        # Check for document
+        if FreeCAD.ActiveDocument:
+            # Check for selected object
+            selection = FreeCADGui.Selection.getSelection()
+            if selection:
+                if selection[-1].Proxy.Type == 'Trails::Terrain':
+                    return True
+        return False
+
+    def Activated(self):
+        """
+        Command activation method
+        """
+        terrain = FreeCADGui.Selection.getSelection()[-1]
+
+        tolerance, ok = QtWidgets.QInputDialog.getDouble(
+            None, "Decimate Terrain", "Maximum vertical error (m):", 0.1, 0, 1000, 3)
+        if not ok: return
+
+        result, ok = QtWidgets.QInputDialog.getItem(
+            None, "Decimate Terrain", "Result:",
+            ["Replace Terrain", "New Terrain"], 0, False)
+        if not ok: return
+
+        # Decimate in mm in background
+        self.runner.start(lambda job, work: work(job.report),
+            lambda decimated: self.finish(terrain, result, decimated),
+            terrain.Proxy.decimation(tolerance*1000))
+
+    @staticmethod
+    def finish(terrain, result, decimated):
+        """
+        Set decimated surface and report its errors.
+        """
+        points, triangles, max_error, rms_error = decimated
+        if result == "New Terrain":
+            terrain = make_terrain.create(label=terrain.Label + " Decimated")
+
+        terrain.Proxy.set_surface(terrain, points, triangles)
+        FreeCAD.ActiveDocument.recompute()
+
+        message = "{} points kept, maximum error {:.3f} m, RMS error {:.3f} m".format(
+            len(points), max_error/1000, rms_error/1000)
+        FreeCAD.Console.PrintMessage(terrain.Label + ": " + message + "\n")
+        QtWidgets.QMessageBox.information(None, "Decimate Terrain", message)
+
+FreeCADGui.addCommand('Decimate Terrain', DecimateTerrain())
@@ -23,9 +23,11 @@
 """Provides GUI tools to create Volume objects."""
 
 import FreeCAD, FreeCADGui
+from PySide2 import QtWidgets
 
 from trails_variables import icons_path
 from ..tasks import task_create_volume
+from ..make import make_terrain
 
 
 class ComputeAreas:
@@ -68,3 +70,67 @@ class ComputeAreas:
         FreeCADGui.Control.showDialog(panel)
 
 FreeCADGui.addCommand('Compute Areas', ComputeAreas())
+
+
+class CompareTerrains:
+    """
+    Command to compute volumes between two Terrains
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        pass
+
+    def GetResources(self):
+        """
+        Return the command resources dictionary
+        """
+        return {
+            'Pixmap': icons_path + '/volume.svg',
+            'MenuText': "Compare Terrains",
+            'ToolTip': "Compute cut and fill volumes between two selected Terrains"
+            }
+
+    def IsActive(self):
+        """
+        Define tool button activation situation
+        """
+        # Check for two selected terrains
+        if FreeCAD.ActiveDocument:
+            selection = FreeCADGui.Selection.getSelection()
+            if len(selection) == 2:
+                for obj in selection:
+                    if not hasattr(obj, "Proxy") \
+                        or getattr(obj.Proxy, "Type", None) != 'Trails::Terrain':
+                        return False
+                return True
+        return False
+
+    def Activated(self):
+        """
+        Command activation method
+        """
+        base, comparison = FreeCADGui.Selection.getSelection()
+
+        spacing, ok = QtWidgets.QInputDialog.getDouble(
+            None, "Compare Terrains", "Grid spacing (m):", 1, 0.01, 1000, 2)
+        if not ok: return
+
+        cut, fill, net, points, triangles = base.Proxy.compare(
+            base, comparison, spacing*1000)
+
+        # Isopach terrain of elevation differences
+        if len(triangles):
+            isopach = make_terrain.create(
+                label="Isopach " + base.Label + " " + comparison.Label)
+            isopach.Proxy.set_surface(isopach, points, triangles)
+            FreeCAD.ActiveDocument.recompute()
+
+        message = "Cut: {:.3f} m3, Fill: {:.3f} m3, Net: {:.3f} m3".format(
+            cut/1e9, fill/1e9, net/1e9)
+        FreeCAD.Console.PrintMessage(message + "\n")
+        QtWidgets.QMessageBox.information(None, "Compare Terrains", message)
+
+FreeCADGui.addCommand('Compare Terrains', CompareTerrains())
@@ -56,4 +56,18 @@ def create(points=[], name='Cluster'):
 
     FreeCAD.ActiveDocument.recompute()
 
+    return obj
+
+def create_from(source, rows, name='Cluster'):
+    """
+    Create a Cluster of source Cluster points at rows, for example
+    rows of a query result.
+    """
+    obj = create(name=name)
+    table = source.Proxy.table
+
+    obj.Proxy.append(obj, table.names[rows],
+        table.coords[rows], table.descriptions(rows))
+    FreeCAD.ActiveDocument.recompute()
+
     return obj
\ No newline at end of file
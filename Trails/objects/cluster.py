@@ -22,11 +22,13 @@
 
 """Provides the object code for Cluster objects."""
 
+import FreeCAD
 import Points
-import copy
+import numpy
 
 from trails_variables import marker_dict
 from ..get import get_georigin
+from ..functions import tin_functions, point_functions, index_functions
 
 
 class Cluster:
@@ -62,25 +64,222 @@ class Cluster:
             "Point Kernel").Points = Points.Points()
 
         obj.Proxy = self
+        self.init_class_members(obj)
+
+    def init_class_members(self, obj):
+        """
+        Separate function for initialization on creation / reload.
+        """
+        self.table = point_functions.PointTable()
+        self.point_index = None
+        self.syncing = False
+        self.stored = True
+
+    def onDocumentRestored(self, obj):
+        """
+        Restore point table from properties on reload.
+        """
+        self.init_class_members(obj)
+        self.pull(obj)
 
     def onChanged(self, obj, prop):
         '''
         Do something when a data property has changed.
         '''
+        # Table is restored after whole document is loaded
+        if "Restore" in obj.State or not hasattr(self, "table"): return
+
+        # Properties set from outside replace table columns
+        if self.syncing: return
+
         if prop == "Vectors":
-            vectors = obj.getPropertyByName(prop)
-            if vectors:
-                origin = get_georigin.get(vectors[0])
+            self.pull(obj)
+            self.update_points(obj)
+
+        # Stored lists of another length are left from older table states
+        elif prop == "PointNames" and len(obj.PointNames) == len(self.table):
+            self.table.patch(numpy.arange(len(self.table)), names=obj.PointNames)
+
+        elif prop == "Descriptions" and len(obj.Descriptions) == len(self.table):
+            self.table.patch(numpy.arange(len(self.table)), descriptions=obj.Descriptions)
+
+    def pull(self, obj):
+        """
+        Fill point table from properties.
+        """
+        self.table.clear()
+        self.table.append(obj.PointNames,
+            tin_functions.vectors_to_array(obj.Vectors), obj.Descriptions)
+        self.point_index = None
+
+    def update_points(self, obj):
+        """
+        Create point kernel of table coordinates relative to georigin.
+        """
+        if len(self.table):
+            obj.Points = Points.Points(self.kernel_points())
+        else:
+            obj.Points = Points.Points()
+
+    def kernel_points(self, rows=None):
+        """
+        Get point kernel tuples of table rows relative to georigin.
+        """
+        origin = get_georigin.get(FreeCAD.Vector(*self.table.coords[0]))
+        points = self.table.georeference(origin.Origin, rows)
+
+        return list(map(tuple, points.tolist()))
+
+    def append(self, obj, names, points, descriptions):
+        '''
+        Append names, Nx3 coordinates and descriptions of points,
+        returns their rows.
+        '''
+        rows = self.table.append(names, points, descriptions)
+        self.point_index = None
+        self.stored = False
+
+        if len(rows) == 0: return rows
+
+        # Only new rows are added to kernel
+        kernel = obj.Points
+        if kernel.CountPoints == rows[0]:
+            kernel.addPoints(self.kernel_points(rows))
+            obj.Points = kernel
+        else:
+            self.update_points(obj)
+
+        return rows
+
+    def patch(self, obj, rows, names=None, points=None, descriptions=None):
+        '''
+        Replace names, coordinates or descriptions of points at rows.
+        '''
+        rows = numpy.asarray(rows, dtype=numpy.int64).reshape(-1)
+        self.table.patch(rows, names, points, descriptions)
+        self.stored = False
+        if points is None or len(rows) == 0: return
+
+        # Changed rows are added to kernel end and moved to their indexes
+        self.point_index = None
+        kernel = obj.Points
+        count = kernel.CountPoints
+        if count == len(self.table):
+            index = numpy.arange(count)
+            index[rows] = count + numpy.arange(len(rows))
+            kernel.addPoints(self.kernel_points(rows))
+            obj.Points = kernel.fromSegment(index.tolist())
+        else:
+            self.update_points(obj)
 
-                points = []
-                for i in vectors:
-                    point = copy.deepcopy(i)
-                    points.append(point.sub(origin.Origin))
+    def remove(self, obj, rows):
+        '''
+        Remove points at rows.
+        '''
+        kernel = obj.Points
+        keep = numpy.ones(len(self.table), dtype=bool)
+        keep[rows] = False
+
+        self.table.remove(rows)
+        self.point_index = None
+        self.stored = False
+
+        # Kept points are copied inside kernel
+        if kernel.CountPoints == len(keep) and len(self.table):
+            obj.Points = kernel.fromSegment(numpy.flatnonzero(keep).tolist())
+        else:
+            self.update_points(obj)
+
+    def get_index(self, obj):
+        """
+        Get spatial index of points, it is rebuilt only after changes.
+        """
+        if self.point_index is None and len(self.table):
+            self.point_index = index_functions.PointIndex(self.table.coords)
+
+        return self.point_index
+
+    def code_rows(self, codes):
+        """
+        Get rows of points which have one of description codes.
+        """
+        ids = [self.table.code_index[i] for i in codes if i in self.table.code_index]
+        return numpy.flatnonzero(numpy.isin(self.table.codes, ids))
+
+    def query(self, obj, center=None, radius=None, count=None, box=None,
+            polygon=None, line=None, distance=0, codes=None):
+        """
+        Get sorted rows of points by a spatial query and description
+        codes. Coordinates are in mm, center is used with radius or
+        nearest count, line is used with distance.
+        """
+        index = self.get_index(obj)
+        if index is None: return numpy.zeros(0, dtype=numpy.int64)
+
+        if center is not None and radius is not None:
+            rows = index.radius(center, radius)
+        elif center is not None and count:
+            rows = numpy.sort(index.nearest(center, count))
+        elif box is not None:
+            rows = index.box(*box)
+        elif polygon is not None:
+            rows = index.polygon(polygon)
+        elif line is not None:
+            rows = index.near_line(line, distance)
+        else:
+            rows = numpy.arange(len(self.table))
+
+        if codes is not None:
+            rows = numpy.intersect1d(rows, self.code_rows(codes))
 
-                obj.Points = Points.Points(points)
+        return rows
+
+    def store(self, obj):
+        """
+        Copy point table to properties before saving.
+        """
+        if self.stored: return
+
+        self.syncing = True
+        obj.PointNames = self.table.names.tolist()
+        obj.Descriptions = self.table.descriptions().tolist()
+        obj.Vectors = list(map(tuple, self.table.coords.tolist()))
+        self.syncing = False
+        self.stored = True
 
     def execute(self, obj):
         '''
         Do something when doing a recomputation. 
         '''
-        return
\ No newline at end of file
+        return
+
+    def __getstate__(self):
+        """
+        Save variables to file.
+        """
+        return self.Type
+
+    def __setstate__(self, state):
+        """
+        Get variables from file.
+        """
+        # Older files keep whole object dictionary
+        if isinstance(state, dict): state = state.get("Type")
+        if state:
+            self.Type = state
+
+
+class ClusterObserver:
+    """
+    Document observer to store Cluster tables before saving.
+    """
+
+    def slotStartSaveDocument(self, doc, filename):
+        """
+        Copy changed Cluster tables to their properties.
+        """
+        for obj in doc.Objects:
+            if isinstance(getattr(obj, "Proxy", None), Cluster):
+                obj.Proxy.store(obj)
+
+FreeCAD.addDocumentObserver(ClusterObserver())
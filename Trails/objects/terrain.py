@@ -24,11 +24,21 @@
 
 import FreeCAD
 import Mesh, Part
+import numpy, os, copy
 
 from trails_variables import icons_path
 from ..functions.terrain_functions import DataFunctions
+from ..functions import tin_functions, analysis_functions, storage_functions, pipeline_functions
+from ..functions import cache_functions, thinning_functions, edit_functions
 from ..get import get_georigin
 
+# Derived Terrain products and products they depend on.
+PRODUCTS = {
+    "triangulation": [],
+    "mesh": ["triangulation"],
+    "contours": ["mesh"],
+    "boundary": ["mesh"],
+    "analysis": ["mesh"]}
 
 class Terrain(DataFunctions):
     """
@@ -62,6 +72,10 @@ class Terrain(DataFunctions):
             "Mesh::PropertyMeshKernel", "Mesh", "Triangulation",
             "Mesh object of triangulation").Mesh = Mesh.Mesh()
 
+        obj.addProperty(
+            "App::PropertyBool", "Incremental", "Triangulation",
+            "Insert added points into existing triangulation").Incremental = True
+
         obj.addProperty(
             "App::PropertyLength", "MaxLength", "Triangulation",
             "Maximum length of triangle edge").MaxLength = 500000
@@ -70,6 +84,26 @@ class Terrain(DataFunctions):
             "App::PropertyAngle","MaxAngle","Triangulation",
             "Maximum angle of triangle edge").MaxAngle = 180
 
+        # Thinning properties.
+        obj.addProperty(
+            "App::PropertyEnumeration", "Thinning", "Thinning",
+            "Thinning method of cluster points").Thinning = [
+                "None", "Grid Minimum", "Grid Mean", "Grid Maximum", "Z Tolerance"]
+
+        obj.addProperty(
+            "App::PropertyLength", "ThinningCell", "Thinning",
+            "Grid cell size of thinning").ThinningCell = 1000
+
+        obj.addProperty(
+            "App::PropertyLength", "ThinningTolerance", "Thinning",
+            "Maximum elevation error of dropped points").ThinningTolerance = 100
+
+        obj.addProperty(
+            "App::PropertyInteger", "DroppedPoints", "Thinning",
+            "Number of cluster points dropped by thinning").DroppedPoints = 0
+
+        obj.setEditorMode('DroppedPoints', 1)
+
         obj.addProperty("Part::PropertyPartShape", "BoundaryShapes", "Triangulation",
             "Boundary Shapes").BoundaryShapes = Part.Shape()
 
@@ -94,54 +128,144 @@ class Terrain(DataFunctions):
             "App::PropertyLength", "MinorInterval", "Contour",
             "Minor contour interval").MinorInterval = 1000
 
+        obj.addProperty(
+            "App::PropertyInteger", "ContourWorkers", "Contour",
+            "Number of processes tracing contour bands").ContourWorkers = 1
+
+        obj.addProperty(
+            "App::PropertyLength", "SimplifyTolerance", "Contour",
+            "Maximum deviation of simplified contours").SimplifyTolerance = 0
+
+        obj.addProperty(
+            "App::PropertyBool", "SmoothContours", "Contour",
+            "Smooth simplified contours").SmoothContours = False
+
+        obj.addProperty(
+            "App::PropertyBool", "CompactStorage", "Storage",
+            "Keep points and triangles as arrays in a binary file").CompactStorage = False
+
+        obj.addProperty(
+            "App::PropertyFileIncluded", "Storage", "Storage",
+            "Binary file of Terrain points and triangles")
+
+        obj.addProperty(
+            "App::PropertyBool", "DiskCache", "Storage",
+            "Keep cached contours and boundaries in a binary file").DiskCache = False
+
+        obj.addProperty(
+            "App::PropertyFileIncluded", "CacheFile", "Storage",
+            "Binary file of cached Terrain shapes")
+
+        obj.setEditorMode('Storage', 2)
+        obj.setEditorMode('CacheFile', 2)
+
         obj.Proxy = self
+        self.init_class_members(obj)
+
+    def init_class_members(self, obj):
+        """
+        Separate function for initialization on creation / reload.
+        """
+        self.triangle_filter = tin_functions.TriangleFilter()
+        self.facet_analysis = analysis_functions.FacetAnalysis()
+        self.pipeline = pipeline_functions.Pipeline(PRODUCTS)
+        self.triangle_index = None
+        self.shape_cache = cache_functions.LRUCache()
+        self.disk_cache = cache_functions.DiskCache()
+        self.mesh_key = None
+        self.points = numpy.zeros((0, 3))
+        self.triangles = numpy.zeros((0, 3), dtype=numpy.int32)
+        self.previous = None
+        self.syncing = False
+        self.meshing = False
+        self.session = None
+        self.edit_delta = None
+        self.contour_state = None
+        self.stored = True
+
+    def onDocumentRestored(self, obj):
+        """
+        Restore point and triangle arrays on reload.
+        """
+        self.init_class_members(obj)
+
+        if self.is_compact(obj):
+            obj.setPropertyStatus("Mesh", "Transient")
+
+            if obj.Storage:
+                self.points, self.triangles = storage_functions.load(obj.Storage)
+                self.update_mesh(obj)
+
+        else:
+            self.points = tin_functions.vectors_to_array(obj.Vectors)
+            self.triangles = tin_functions.triangles_array(obj.Delaunay)
+
+        if self.is_disk_cached(obj) and obj.CacheFile:
+            self.disk_cache.open(obj.CacheFile)
+
+        # Products are restored from file, only analysis is left
+        for name in ["triangulation", "mesh", "contours", "boundary"]:
+            self.pipeline.validate(name)
 
     def onChanged(self, obj, prop):
         '''
         Do something when a data property has changed.
         '''
+        # Arrays are restored after whole document is loaded
+        if "Restore" in obj.State: return
+
         if prop == "Placement":
             placement = obj.getPropertyByName(prop)
             copy_mesh = obj.Mesh.copy()
             copy_mesh.Placement = placement
+
+            self.meshing = True
             obj.Mesh = copy_mesh
+            self.meshing = False
+
+        if prop == "Mesh":
+            # Mesh edited by other tools changes Terrain surface
+            if not self.meshing: self.pull_mesh(obj)
 
-        if prop =="Clusters":
-            pgs = obj.getPropertyByName(prop)
-            points = []
-            for pg in pgs:
-                points.extend(pg.Vectors)
+            # Edit session is only kept for its own edits
+            if self.edit_delta is None:
+                self.session = None
+                self.contour_state = None
 
-            obj.Vectors = points
+            self.facet_analysis.reset()
+            self.triangle_index = None
+            self.mesh_key = None
+            self.pipeline.validate("mesh")
 
-        if prop =="Vectors":
+        if prop in ["Clusters", "Thinning", "ThinningCell", "ThinningTolerance"]:
+            if prop == "Clusters" or (obj.Clusters and self.thinning_depends(obj, prop)):
+                self.update_clusters(obj)
+
+        if prop =="Vectors" and not self.syncing:
             vectors = obj.getPropertyByName(prop)
-            if vectors:
-                base = get_georigin.get(vectors[0]).Origin
+            self.set_points(obj, tin_functions.vectors_to_array(vectors))
+
+        if prop == "Delaunay" and not self.syncing:
+            delaunay = obj.getPropertyByName(prop)
+            self.set_triangles(obj, tin_functions.triangles_array(delaunay))
 
-                if len(vectors) > 2:
-                    pts = []
-                    for i in vectors:
-                        pts.append(i.sub(base))
+        if prop == "MaxLength" or prop == "MaxAngle":
+            self.pipeline.invalidate("mesh")
 
-                    obj.Delaunay = self.triangulate(vectors)
-                else:
-                    obj.Mesh = Mesh.Mesh()
+        if prop in ["MajorInterval", "MinorInterval", "SimplifyTolerance", "SmoothContours"]:
+            self.pipeline.invalidate("contours")
 
-        if prop == "Delaunay" or prop == "MaxLength" or prop == "MaxAngle":
-            delaunay = obj.getPropertyByName("Delaunay")
-            vectors = obj.getPropertyByName("Vectors")
-            lmax = obj.getPropertyByName("MaxLength")
-            amax = obj.getPropertyByName("MaxAngle")
-            base = get_georigin.get().Origin
+        if prop == "CompactStorage":
+            if self.is_compact(obj):
+                obj.setPropertyStatus("Mesh", "Transient")
+            else:
+                obj.setPropertyStatus("Mesh", "-Transient")
 
-            pts = []
-            for i in vectors:
-                pts.append(i.sub(base))
+            self.stored = False
 
-            if delaunay:
-                obj.Mesh = self.test_delaunay(
-                    pts, delaunay, lmax, amax)
+        if prop == "DiskCache" and not self.is_disk_cached(obj):
+            self.disk_cache = cache_functions.DiskCache()
+            obj.CacheFile = ""
 
         if prop == "MinorInterval":
             min_int = obj.getPropertyByName(prop)
@@ -151,10 +275,361 @@ class Terrain(DataFunctions):
         '''
         Do something when doing a recomputation. 
         '''
-        major = obj.MajorInterval
-        minor = obj.MinorInterval
+        # Rebuild only dirty products
+        self.pipeline.begin()
+        self.pipeline.update("triangulation", self.update_triangles, obj)
+        self.pipeline.update("mesh", self.update_mesh, obj)
+        self.pipeline.update("contours", self.update_contours, obj)
+        self.pipeline.update("boundary", self.update_boundary, obj)
+
+        # Write binary file of cached shapes if new shapes are added
+        if self.is_disk_cached(obj) and self.disk_cache.changed:
+            path = self.disk_cache.save()
+            obj.CacheFile = path
+            os.remove(path)
+            self.disk_cache.open(obj.CacheFile)
+
+    def rebuild_report(self):
+        """
+        Return products rebuilt by last recomputation with their
+        durations in seconds, and products which are still dirty.
+        """
+        return {
+            "rebuilt": list(self.pipeline.report),
+            "stale": self.pipeline.stale()}
+
+    @staticmethod
+    def is_compact(obj):
+        """
+        Check Terrain uses compact array storage.
+        """
+        return hasattr(obj, "CompactStorage") and obj.CompactStorage
+
+    @staticmethod
+    def is_disk_cached(obj):
+        """
+        Check Terrain keeps cached shapes in a binary file.
+        """
+        return hasattr(obj, "DiskCache") and obj.DiskCache
+
+    @staticmethod
+    def thinning_depends(obj, prop):
+        """
+        Check active thinning method uses a changed property.
+        """
+        if prop == "ThinningCell":
+            return obj.Thinning != "None"
+
+        if prop == "ThinningTolerance":
+            return obj.Thinning == "Z Tolerance"
+
+        return True
+
+    def update_clusters(self, obj):
+        """
+        Set thinned cluster points as Terrain points.
+        """
+        points = [pg.Proxy.table.coords for pg in obj.Clusters]
+        points = numpy.vstack(points) if points else numpy.zeros((0, 3))
+
+        if hasattr(obj, "Thinning"):
+            thinned = thinning_functions.thin(points, obj.Thinning,
+                obj.ThinningCell.Value, obj.ThinningTolerance.Value)
+
+            obj.DroppedPoints = len(points) - len(thinned)
+            if obj.DroppedPoints:
+                FreeCAD.Console.PrintMessage(
+                    "{}: {} of {} points dropped by thinning\n".format(
+                        obj.Label, obj.DroppedPoints, len(points)))
+
+            points = thinned
+
+        self.set_points(obj, points)
+
+    def set_points(self, obj, points):
+        """
+        Set Terrain points, they are triangulated on recomputation.
+        """
+        if len(points):
+            get_georigin.get(FreeCAD.Vector(*points[0]))
+
+        # Keep last triangulated points for incremental insertion
+        if not self.pipeline.is_dirty("triangulation"):
+            self.previous = self.points, self.triangles
+
+        self.points = points
+        self.stored = False
+        self.pipeline.invalidate("triangulation")
+
+    def set_triangles(self, obj, triangles):
+        """
+        Set Terrain triangles, mesh is updated on recomputation.
+        """
+        self.triangles = triangles
+        self.previous = None
+        self.stored = False
+        self.pipeline.validate("triangulation")
+
+    def set_surface(self, obj, points, triangles):
+        """
+        Replace Terrain points and their triangles.
+        """
+        self.set_points(obj, points)
+        self.set_triangles(obj, triangles)
+
+    def update_triangles(self, obj):
+        """
+        Triangulate Terrain points.
+        """
+        self.set_triangulation(obj, self.triangulation(obj)())
+
+    def triangulation(self, obj):
+        """
+        Get a work which triangulates Terrain points without setting
+        them. It uses Terrain arrays and a copy of triangle filter taken
+        here, so it can run in a background job. Work returns points,
+        triangles and triangle filter.
+        """
+        points, previous = self.points, self.previous
+        incremental = hasattr(obj, "Incremental") and obj.Incremental
+        triangle_filter = copy.copy(self.triangle_filter)
+
+        def work(progress=None):
+            if len(points) > 2:
+                return (*self.update_delaunay(points, previous, incremental,
+                    triangle_filter, progress), triangle_filter)
+
+            triangle_filter.reset()
+            return points, numpy.zeros((0, 3), dtype=numpy.int32), triangle_filter
+
+        return work
+
+    def set_triangulation(self, obj, result):
+        """
+        Set points, triangles and triangle filter of a finished
+        triangulation.
+        """
+        self.points, self.triangles, self.triangle_filter = result
+        self.previous = None
+        self.stored = False
+        self.pipeline.validate("triangulation")
+
+    def store(self, obj):
+        """
+        Copy arrays to Vectors and Delaunay properties before saving.
+        Compact storage writes them to a binary file instead.
+        """
+        if self.stored: return
+
+        self.syncing = True
+        if self.is_compact(obj):
+            path = storage_functions.save(self.points, self.triangles)
+            obj.Storage = path
+            os.remove(path)
+
+            obj.Vectors = []
+            obj.Delaunay = []
+        else:
+            obj.Vectors = list(map(tuple, self.points.tolist()))
+            obj.Delaunay = self.triangles.ravel().tolist()
+        self.syncing = False
+
+        self.stored = True
+        obj.purgeTouched()
+
+    def update_mesh(self, obj):
+        """
+        Create mesh of triangles within max length and max angle.
+        Mesh is patched when points are inserted into triangulation.
+        """
+        if len(self.triangles) == 0:
+            self.meshing = True
+            obj.Mesh = Mesh.Mesh()
+            self.meshing = False
+            return
+
+        lmax = obj.getPropertyByName("MaxLength")
+        amax = obj.getPropertyByName("MaxAngle")
+        base = get_georigin.get().Origin
+
+        pts = self.points - numpy.array(tuple(base))
+
+        mesh = None
+        if obj.Mesh.Placement.isIdentity() \
+            and self.triangle_filter.limits == (lmax.Value, amax.Value):
+            mesh = self.patch_mesh(obj.Mesh, pts)
+
+        if mesh is None:
+            mesh = self.test_delaunay(pts, self.triangles, lmax.Value, amax.Value)
+            mesh.Placement = obj.Placement
+
+        self.meshing = True
+        obj.Mesh = mesh
+        self.meshing = False
+
+    def pull_mesh(self, obj):
+        """
+        Take points and triangles of a mesh which is not created by
+        Terrain, so edits are kept on save and reload.
+        """
+        mesh = obj.Mesh.copy()
+        mesh.Placement = FreeCAD.Placement()
+        points, triangles = self.mesh_to_arrays(mesh)
+        base = get_georigin.get().Origin
+
+        self.points = points + numpy.array(tuple(base))
+        self.triangles = triangles
+        self.previous = None
+        self.stored = False
+        self.triangle_filter.reset()
+        self.pipeline.validate("triangulation")
+
+    def update_contours(self, obj):
+        """
+        Create contour shapes of Terrain mesh.
+        """
+        major, minor, tolerance, smooth = self.contour_params(obj)
+        workers = obj.ContourWorkers if hasattr(obj, "ContourWorkers") else 1
+
+        obj.ContourShapes = self.cached_shape(obj, "contours",
+            lambda: self.contour_groups(
+                obj.Mesh, major/1000, minor/1000, workers, tolerance, smooth),
+            self.contour_shape, major, minor, tolerance, smooth)
+
+    @staticmethod
+    def contour_params(obj):
+        """
+        Get contour intervals and simplify tolerance in mm and smoothing.
+        """
+        major = obj.MajorInterval.Value
+        minor = obj.MinorInterval.Value
+        tolerance = obj.SimplifyTolerance.Value if hasattr(obj, "SimplifyTolerance") else 0
+        smooth = obj.SmoothContours if hasattr(obj, "SmoothContours") else False
+
+        return major, minor, tolerance, smooth
+
+    def get_session(self, obj):
+        """
+        Get edit session of Terrain mesh, it is started from current
+        mesh facets so their indexes are kept.
+        """
+        if self.session is None:
+            points, triangles = self.mesh_to_arrays(obj.Mesh)
+            self.session = edit_functions.EditSession(points, triangles)
+
+            # Working mesh is patched in place on every edit
+            self.session.mesh = obj.Mesh.copy()
+
+        return self.session
+
+    def edit(self, obj, operation, *args):
+        """
+        Apply an edit session operation to Terrain, returns its delta
+        or None if the edit is not possible.
+        """
+        delta = getattr(self.get_session(obj), operation)(*args)
+        if delta is not None: self.apply_edit(obj, delta)
+
+        return delta
+
+    def undo_edit(self, obj):
+        """
+        Revert last edit of Terrain.
+        """
+        delta = self.get_session(obj).undo()
+        if delta is not None: self.apply_edit(obj, delta)
+
+        return delta
+
+    def redo_edit(self, obj):
+        """
+        Apply last reverted edit of Terrain.
+        """
+        delta = self.get_session(obj).redo()
+        if delta is not None: self.apply_edit(obj, delta)
+
+        return delta
+
+    def apply_edit(self, obj, delta):
+        """
+        Update Terrain arrays, mesh facets and products of an applied
+        edit delta. Contours and boundary are updated locally.
+        """
+        session = self.session
+        base = get_georigin.get().Origin
+
+        # Bounding box of touched triangles
+        vertices = session.touched(delta)
+        box = (*vertices[:, :2].min(axis=0), *vertices[:, :2].max(axis=0))
+        zrange = vertices[:, 2].min(), vertices[:, 2].max()
+
+        self.points = session.points + numpy.array(tuple(base))
+        self.triangles = session.triangles
+        self.previous = None
+        self.stored = False
+        self.triangle_filter.reset()
+        self.pipeline.validate("triangulation")
+
+        # Patch mesh facets, their order follows session rows
+        mesh = session.mesh
+        if len(delta.rows): mesh.removeFacets(delta.rows.tolist())
+        if len(delta.added):
+            facets = session.points[delta.added]
+            if not mesh.Placement.isIdentity():
+                inverse = mesh.Placement.inverse()
+                facets = numpy.array([tuple(inverse.multVec(FreeCAD.Vector(*i)))
+                    for i in facets.reshape(-1, 3).tolist()]).reshape(-1, 3, 3)
+            mesh.addFacets([list(map(tuple, i)) for i in facets.tolist()])
+
+        self.edit_delta = delta
+        self.meshing = True
+        obj.Mesh = mesh
+        self.meshing = False
+        self.edit_delta = None
+
+        obj.ContourShapes = self.local_contours(session.points, session.triangles,
+            box, zrange, self.contour_params(obj))
+        self.pipeline.validate("contours")
+
+        if edit_functions.boundary_touched(session.triangles, delta):
+            obj.BoundaryShapes = self.boundary_shape([[session.points[ring]
+                for ring in tin_functions.boundary_rings(session.triangles)]])
+        self.pipeline.validate("boundary")
+
+    def update_boundary(self, obj):
+        """
+        Create boundary shapes of Terrain mesh.
+        """
+        obj.BoundaryShapes = self.cached_shape(obj, "boundary",
+            lambda: self.boundary_groups(obj.Mesh), self.boundary_shape)
+
+    def __getstate__(self):
+        """
+        Save variables to file.
+        """
+        return self.Type
+
+    def __setstate__(self, state):
+        """
+        Get variables from file.
+        """
+        # Older files keep whole object dictionary
+        if isinstance(state, dict): state = state.get("Type")
+        if state:
+            self.Type = state
+
+
+class TerrainObserver:
+    """
+    Document observer to store Terrain arrays before saving.
+    """
 
-        obj.ContourShapes = self.get_contours(
-            obj.Mesh, major.Value/1000, minor.Value/1000)
+    def slotStartSaveDocument(self, doc, filename):
+        """
+        Copy changed Terrain arrays to their properties.
+        """
+        for obj in doc.Objects:
+            if isinstance(getattr(obj, "Proxy", None), Terrain):
+                obj.Proxy.store(obj)
 
-        obj.BoundaryShapes = self.get_boundary(obj.Mesh)
+FreeCAD.addDocumentObserver(TerrainObserver())
@@ -24,10 +24,13 @@
 
 import FreeCAD, FreeCADGui
 from PySide2 import QtWidgets
+import os
 
 from trails_variables import ui_path
 from .task_panel import TaskPanel
+from .task_job import JobRunner
 from ..get import get_clusters
+from ..functions import export_functions, binary_functions
 
 
 class TaskClusterExport(TaskPanel):
@@ -35,6 +38,7 @@ class TaskClusterExport(TaskPanel):
         # Set UI.
         self.form = FreeCADGui.PySideUic.loadUi(ui_path + '/export_points.ui')
         self.form.BrowseB.clicked.connect(self.file_destination)
+        self.runner = JobRunner("Exporting points")
 
         # Add point groups to QListWidget
         clusters = get_clusters.get()
@@ -52,10 +56,12 @@ class TaskClusterExport(TaskPanel):
         parameter = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/General")
         path = parameter.GetString("FileOpenSavePath")
         file_name = QtWidgets.QFileDialog.getSaveFileName(
-            None, 'Save File', path, Filter='*.txt')
+            None, 'Save File', path,
+            Filter='Text (*.txt *.csv);;PLY (*.ply);;NumPy (*.npy *.npz)')
 
         # Add ".txt" if needed
-        if file_name[0][-4:] == ".txt":
+        extension = os.path.splitext(file_name[0])[1].lower()
+        if extension in [".txt", ".csv", ".ply", ".npy", ".npz"]:
             fn = file_name[0]
         else:
             fn = file_name[0] + ".txt"
@@ -68,50 +74,47 @@ class TaskClusterExport(TaskPanel):
         """
         # Get user inputs
         line_edit = self.form.FileDestinationLE
-        point_name = self.form.PointNameLE.text()
-        northing = self.form.NorthingLE.text()
-        easting = self.form.EastingLE.text()
-        elevation = self.form.ElevationLE.text()
-        description = self.form.DescriptionLE.text()
-
         if line_edit.text().strip() == "" or self.form.PointGroupsLW.count() < 1:
             return
 
-        # Set delimiter
-        if self.form.DelimiterCB.currentText() == "Space":
-            delimiter = ' '
-        elif self.form.DelimiterCB.currentText() == "Comma":
-            delimiter = ','
-
-        # Create point file
-        try:
-            file = open(line_edit.text(), 'w')
-        except Exception:
-            FreeCAD.Console.PrintMessage("Can't open file")
+        # Fields are written in order of their column numbers
+        columns = [int(i.text()) for i in [self.form.PointNameLE, self.form.EastingLE,
+            self.form.NorthingLE, self.form.ElevationLE, self.form.DescriptionLE]]
+        order = sorted(range(5), key=lambda i: columns[i])
+        delimiter = export_functions.DELIMITERS[self.form.DelimiterCB.currentText()]
 
-        counter = 1
-        # Get selected point groups
+        # Get properties of selected point groups once
+        groups = []
         for selection in self.form.PointGroupsLW.selectedIndexes():
             group = self.group_dict[selection.data()]
+            table = group.Proxy.table
+            groups.append((table.names.tolist(),
+                table.coords.copy(), table.descriptions().tolist()))
+
+        path = line_edit.text()
+        precision = self.form.PrecisionSB.value()
+        fixed = self.form.FixedPrecisionChB.isChecked()
+        total = max(sum(len(i[1]) for i in groups), 1)
+
+        # Binary files keep all points in one table
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".ply":
+            work = lambda job: binary_functions.write_ply(
+                path, *export_functions.merge_groups(groups))
+        elif extension in [".npy", ".npz"]:
+            work = lambda job: binary_functions.write_numpy(
+                path, *export_functions.merge_groups(groups))
+        else:
+            work = lambda job: export_functions.write_points(
+                path, groups, order, delimiter, precision, fixed,
+                progress=lambda count: job.report(100 * count / total))
 
-            # Print points to the file
-            for p in group.Vectors:
-                index = group.Vectors.index(p)
-                x = str(round(p.x/1000, 3))
-                y = str(round(p.y/1000, 3))
-                z = str(round(p.z/1000, 3))
-
-                if group.PointNames:
-                    pn = group.PointNames[index]
-                else:
-                    pn = counter
-                    counter += 1
-
-                des = ''
-                if group.Descriptions:
-                    des = group.Descriptions[index]
-
-                format = [pn, x, y, z, des]
-                file.write(delimiter.join(format) +"\n")
-        file.close()
-        FreeCADGui.Control.closeDialog()
\ No newline at end of file
+        # File is written in background
+        self.runner.start(work, lambda result: FreeCADGui.Control.closeDialog())
+
+    def reject(self):
+        """
+        Cancel running export and close dialog.
+        """
+        self.runner.cancel()
+        return True
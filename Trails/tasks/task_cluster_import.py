@@ -24,12 +24,15 @@
 
 import FreeCAD, FreeCADGui
 from PySide2 import QtCore, QtWidgets
-import csv, os
+import numpy
+import os
 
 from trails_variables import ui_path
 from .task_panel import TaskPanel
+from .task_job import JobRunner
 from ..get import get_clusters, get_georigin
 from ..make import make_cluster
+from ..functions import import_functions, las_functions, binary_functions
 
 
 class TaskClusterImport(TaskPanel):
@@ -44,6 +47,8 @@ class TaskClusterImport(TaskPanel):
         # Get *.ui file(s)
         self.form = FreeCADGui.PySideUic.loadUi(ui_path + "/import_points.ui")
 
+        self.runner = JobRunner("Importing points")
+
         # UI connections
         self.form.AddB.clicked.connect(self.add_file)
         self.form.RemoveB.clicked.connect(self.remove_file)
@@ -120,99 +125,47 @@ class TaskClusterImport(TaskPanel):
         self.form.SubGroupListCB.addItem(new_group.Label)
         self.subpanel.close()
 
-    def file_reader(self, file, operation):
+    def columns(self):
         """
-        Read file points and show them to user or add them to point group
+        Get zero based name, easting, northing, elevation and
+        description column indexes
         """
-        # Get user inputs
-        names = []
-        vectors = []
-        descriptions = []
-
-        counter = 1
-        point_name = self.form.PointNameLE.text()
-        northing = self.form.NorthingLE.text()
-        easting = self.form.EastingLE.text()
-        elevation = self.form.ElevationLE.text()
-        description = self.form.DescriptionLE.text()
-
-        # Set delimiter
-        combobox = self.form.DelimiterCB
-
-        if combobox.currentText() == "Space":
-            reader = csv.reader(file, delimiter=' ',
-                skipinitialspace=True)
-
-        if combobox.currentText() == "Comma":
-            reader = csv.reader(file, delimiter=',')
-
-        if combobox.currentText() == "Tab":
-            reader = csv.reader(file, delimiter='\t')
-
-        table_widget = self.form.PreviewTW
-
-        # Read files
-        for row in reader:
-            pn = int(point_name) - 1
-            n = int(northing) - 1
-            e = int(easting) - 1
-            z = int(elevation) - 1
-            d = int(description) - 1
-
-            # Show point file data in QTableView
-            if operation == "Preview":
-                numRows = table_widget.rowCount()
-                table_widget.insertRow(numRows)
-
-                try:
-                    table_widget.setItem(
-                        numRows, 0, QtWidgets.QTableWidgetItem(row[pn]))
-                except Exception:
-                    pass
-
-                try:
-                    table_widget.setItem(
-                        numRows, 1, QtWidgets.QTableWidgetItem(row[e]))
-                except Exception:
-                    pass
-
-                try:
-                    table_widget.setItem(
-                        numRows, 2, QtWidgets.QTableWidgetItem(row[n]))
-                except Exception:
-                    pass
-
-                try:
-                    table_widget.setItem(
-                        numRows, 3, QtWidgets.QTableWidgetItem(row[z]))
-                except Exception:
-                    pass
-
-                try:
-                    table_widget.setItem(
-                        numRows, 4, QtWidgets.QTableWidgetItem(row[d]))
-                except Exception:
-                    pass
-
-                if counter == 500:
-                    break
-                else:
-                    counter += 1
-
-            # Add points to point group
-            elif operation == "Import":
-                try: name = row[pn]
-                except Exception: name = ""
-
-                try: des = row[d]
-                except Exception: des = ""
-
-                names.append(name)
-                descriptions.append(des)
-                vector = FreeCAD.Vector(float(row[e]), float(row[n]), float(row[z]))
-                vectors.append(vector.multiply(1000))
-
-        return names, vectors, descriptions
+        return tuple(int(i.text()) - 1 for i in [
+            self.form.PointNameLE, self.form.EastingLE, self.form.NorthingLE,
+            self.form.ElevationLE, self.form.DescriptionLE])
+
+    def delimiter(self):
+        """
+        Get selected delimiter
+        """
+        return import_functions.DELIMITERS[self.form.DelimiterCB.currentText()]
+
+    def las_filters(self):
+        """
+        Get LAS classification codes and bounds, None if they are empty
+        """
+        classes = self.form.LasClassesLE.text().replace(",", " ").split()
+        bounds = self.form.LasBoundsLE.text().replace(",", " ").split()
+
+        classes = [int(i) for i in classes] if classes else None
+        bounds = [float(i) for i in bounds] if len(bounds) == 4 else None
+
+        return classes, bounds
+
+    def reader(self, path, delimiter, columns, filters, progress=None):
+        """
+        Get chunk reader of a point file by its extension
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".las":
+            return las_functions.read_las(path, *filters, progress=progress)
+        elif extension == ".ply":
+            return binary_functions.read_ply(path, progress=progress)
+        elif extension in [".npy", ".npz"]:
+            return binary_functions.read_numpy(path, progress=progress)
+
+        return import_functions.read_points(
+            path, delimiter, columns, progress=progress)
 
     def preview(self):
         """
@@ -225,11 +178,28 @@ class TaskClusterImport(TaskPanel):
         if selected_file:
             head, tail = os.path.split(selected_file[0].text())
             self.form.PreviewL.setText("Preview: " + tail)
-            self.form.PreviewTW.setRowCount(0)
-
-            # Send selected point file to preview
-            file = open(selected_file[0].text(), 'r')
-            self.file_reader(file, "Preview")
+            table_widget = self.form.PreviewTW
+            table_widget.setRowCount(0)
+
+            # Show first rows of point file in QTableView
+            path = selected_file[0].text()
+            if path.lower().endswith((".las", ".ply", ".npy", ".npz")):
+                names, coords, codes = next(self.reader(path, None, None,
+                    self.las_filters()), ([], numpy.zeros((0, 3)), []))
+                rows = [[n, *map(str, c / 1000), d] for n, c, d in
+                    zip(names[:500], coords[:500].tolist(), codes[:500])]
+                order = range(5)
+
+            else:
+                rows = import_functions.preview_rows(path, self.delimiter())
+                order = self.columns()
+
+            table_widget.setRowCount(len(rows))
+            for i, row in enumerate(rows):
+                for column, index in enumerate(order):
+                    if 0 <= index < len(row):
+                        table_widget.setItem(
+                            i, column, QtWidgets.QTableWidgetItem(row[index]))
 
     def accept(self):
         """
@@ -251,26 +221,43 @@ class TaskClusterImport(TaskPanel):
             FreeCAD.Console.PrintMessage("No Files selected")
             return
 
-        items = []
-        for i in range(list_widget.count()):
-            items.append(list_widget.item(i))
-        file_paths = [i.text() for i in items]
-        names = group.PointNames.copy()
-        points = group.Vectors.copy()
-        descriptions = group.Descriptions.copy()
+        file_paths = [list_widget.item(i).text() for i in range(list_widget.count())]
+
+        # Files are read in background, chunks are added as they are read
+        self.runner.start(self.read_files, lambda result: self.add_points(group),
+            file_paths, self.delimiter(), self.columns(), self.las_filters(),
+            consume=lambda chunk: group.Proxy.append(group, *chunk))
 
+    def read_files(self, job, file_paths, delimiter, columns, filters):
+        """
+        Read point files in chunks, runs in a background job
+        """
+        total = max(sum(os.path.getsize(i) for i in file_paths), 1)
+        offset = 0
+
+        # Each chunk is added to Cluster before next one is read
         for path in file_paths:
-            file = open(path, 'r')
-            names, vectors, descriptions =self.file_reader(file, "Import")
-            names.extend(names)
-            points.extend(vectors)
-            descriptions.extend(descriptions)
-
-        group.PointNames = names
-        group.Vectors = points
-        group.Descriptions = descriptions
+            size = os.path.getsize(path)
+            progress = lambda fraction: job.report(
+                100 * (offset + fraction * size) / total)
+            for chunk in self.reader(path, delimiter, columns, filters, progress):
+                job.deliver(chunk)
+
+            offset += size
+
+    def add_points(self, group):
+        """
+        Update point group after all points are added
+        """
         group.recompute()
         FreeCADGui.Control.closeDialog()
 
+    def reject(self):
+        """
+        Cancel running import and close dialog
+        """
+        self.runner.cancel()
+        return True
+
     def needsFullSpace(self):
         return True
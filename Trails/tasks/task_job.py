@@ -0,0 +1,214 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Provides a background job runner for Trails tasks."""
+
+import FreeCAD, FreeCADGui
+from PySide2 import QtCore, QtWidgets
+
+
+class Cancelled(Exception):
+    """
+    Raised in a job work when it is cancelled.
+    """
+    pass
+
+
+class Job(QtCore.QObject):
+    """
+    Run a work function in a worker thread. Work gets the job as its
+    first argument to report progress.
+    """
+
+    progress = QtCore.Signal(int)
+    part = QtCore.Signal(object)
+    done = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+    def __init__(self, work, *args):
+        super().__init__()
+        self.work = work
+        self.args = args
+        self.stopped = False
+        self.taken = QtCore.QSemaphore()
+
+    def report(self, percent):
+        """
+        Emit progress percent, raises Cancelled if job is cancelled.
+        """
+        if self.stopped: raise Cancelled()
+        self.progress.emit(int(percent))
+
+    def deliver(self, data):
+        """
+        Emit a part of result and wait until it is applied on GUI
+        thread, so only one part is kept in memory.
+        """
+        if self.stopped: raise Cancelled()
+        self.part.emit(data)
+
+        while not self.taken.tryAcquire(1, 100):
+            if self.stopped: raise Cancelled()
+
+    @QtCore.Slot()
+    def run(self):
+        """
+        Run work and emit its result.
+        """
+        try:
+            result = self.work(self, *self.args)
+
+        except Cancelled:
+            self.cancelled.emit()
+            return
+
+        except Exception as error:
+            self.failed.emit(str(error))
+            return
+
+        # Result of a job cancelled at its last step is dropped
+        if self.stopped: self.cancelled.emit()
+        else: self.done.emit(result)
+
+
+class JobRunner(QtCore.QObject):
+    """
+    Run jobs in a QThread with a progress dialog. Results and parts
+    of results are applied on GUI thread in one transaction.
+    """
+
+    def __init__(self, label):
+        super().__init__()
+        self.label = label
+        self.thread = None
+        self.job = None
+        self.apply = None
+        self.consume = None
+        self.opened = False
+        self.dialog = None
+
+    def is_running(self):
+        """
+        Check a job is running.
+        """
+        return self.thread is not None
+
+    def start(self, work, apply, *args, consume=None):
+        """
+        Run work(job, *args) in a thread and call apply(result) when
+        it is finished. Parts delivered by work are passed to consume.
+        Returns False if a job is already running.
+        """
+        if self.thread is not None: return False
+
+        self.apply = apply
+        self.consume = consume
+        self.dialog = QtWidgets.QProgressDialog(
+            self.label, "Cancel", 0, 100, FreeCADGui.getMainWindow())
+        self.dialog.setWindowModality(QtCore.Qt.WindowModal)
+        self.dialog.setMinimumDuration(500)
+        self.dialog.setAutoClose(False)
+        self.dialog.canceled.connect(self.cancel)
+
+        self.thread = QtCore.QThread()
+        self.job = Job(work, *args)
+        self.job.moveToThread(self.thread)
+
+        self.thread.started.connect(self.job.run)
+        self.job.progress.connect(self.dialog.setValue)
+        self.job.part.connect(self.take)
+        self.job.done.connect(self.finish)
+        self.job.failed.connect(self.fail)
+        self.job.cancelled.connect(self.stop)
+
+        self.thread.start()
+        return True
+
+    @QtCore.Slot()
+    def cancel(self):
+        """
+        Ask running job to stop at its next progress report.
+        """
+        if self.job is not None: self.job.stopped = True
+
+    @QtCore.Slot(object)
+    def take(self, data):
+        """
+        Apply a delivered part and let job continue.
+        """
+        if self.job is None: return
+
+        if not self.job.stopped:
+            doc = FreeCAD.ActiveDocument
+            if doc and not self.opened: doc.openTransaction(self.label)
+            self.opened = True
+            self.consume(data)
+
+        self.job.taken.release()
+
+    @QtCore.Slot()
+    def stop(self):
+        """
+        Finish worker thread and close progress dialog. Parts applied
+        before a cancel or an error are kept.
+        """
+        if self.opened and FreeCAD.ActiveDocument:
+            FreeCAD.ActiveDocument.commitTransaction()
+        self.opened = False
+
+        if self.thread is None: return
+
+        self.job = None
+        self.thread.quit()
+        self.thread.wait()
+        self.thread = None
+
+        self.dialog.canceled.disconnect(self.cancel)
+        self.dialog.close()
+        self.dialog = None
+
+    @QtCore.Slot(str)
+    def fail(self, message):
+        """
+        Stop job and show its error.
+        """
+        self.stop()
+        FreeCAD.Console.PrintError("{}: {}\n".format(self.label, message))
+
+    @QtCore.Slot(object)
+    def finish(self, result):
+        """
+        Stop job and apply its result in one transaction.
+        """
+        opened = self.opened
+        self.opened = False
+        self.stop()
+
+        doc = FreeCAD.ActiveDocument
+        if doc and not opened: doc.openTransaction(self.label)
+
+        try:
+            self.apply(result)
+
+        finally:
+            if doc: doc.commitTransaction()
@@ -28,6 +28,7 @@ from PySide import QtGui, QtCore
 
 from trails_variables import ui_path
 from ..tasks import landxml_subtask
+from .task_job import JobRunner
 from ..make import make_alignment, make_terrain, make_cluster
 
 
@@ -39,6 +40,7 @@ class TaskLandXMLImporter:
         """
         self.form = FreeCADGui.PySideUic.loadUi(ui_path + '/import_landxml_panel.ui')
         self.form.tb_browse.clicked.connect(self.choose_file)
+        self.runner = JobRunner("Importing LandXML")
         self.form.le_filename.textChanged.connect(self.examine_file)
 
     def choose_file(self):
@@ -98,8 +100,29 @@ class TaskLandXMLImporter:
         """
         Accept the task parameters
         """
+        # File is parsed in background, objects are created when it is done
+        self.runner.start(self.read_model, self.create_objects)
+
+    def read_model(self, job):
+        """
+        Parse model data and surface face indexes, runs in a background job
+        """
+        job.report(0)
         data = self.subtask.import_model()
+        if not data: return data
+
+        job.report(80)
+        for s in data['Surfaces'].values():
+            lookup = {key: i for i, key in enumerate(s['Points'])}
+            s['Indexes'] = [lookup[i] for face in s['Faces'] for i in face[:3]]
+
+        job.report(100)
+        return data
 
+    def create_objects(self, data):
+        """
+        Create model objects
+        """
         if self.subtask.errors:
 
             print('Errors encountered during import:\n')
@@ -129,16 +152,7 @@ class TaskLandXMLImporter:
         for name, s in data['Surfaces'].items():
             points = list(s['Points'].values())
             surf = make_terrain.create(points, name)
-
-            indexes = []
-            for i in s['Faces']:
-                key_list = list(s['Points'].keys())
-                c1 = key_list.index(i[0])
-                c2 = key_list.index(i[1])
-                c3 = key_list.index(i[2])
-                indexes.extend([c1, c2, c3])
-
-            surf.Delaunay = indexes
+            surf.Delaunay = s['Indexes']
 
         for align in data['Alignments'].values():
 
@@ -157,6 +171,7 @@ class TaskLandXMLImporter:
 
         FreeCAD.ActiveDocument.recompute()
         FreeCADGui.SendMsgToActiveView("ViewFit")
+        FreeCADGui.Control.closeDialog()
 
         return True
 
@@ -164,6 +179,7 @@ class TaskLandXMLImporter:
         """
         Reject the task
         """
+        self.runner.cancel()
         return True
 
     def clicked(self, index):
@@ -22,12 +22,14 @@
 
 """Provides the viewprovider code for Cluster objects."""
 
-import FreeCAD
+import FreeCADGui
 from pivy import coin
-import random, copy
+import numpy
+import random
 
 from trails_variables import icons_path, marker_dict
 from ..get import get_georigin
+from ..functions import tin_functions
 
 
 class ViewProviderCluster:
@@ -61,6 +63,14 @@ class ViewProviderCluster:
             "App::PropertyBool", "Description", "Labels",
             "Show description labels").Description = False
 
+        vobj.addProperty(
+            "App::PropertyDistance", "LabelDistance", "Labels",
+            "Show labels near camera or below view height, 0 for all").LabelDistance = 200000
+
+        vobj.addProperty(
+            "App::PropertyInteger", "MaxLabels", "Labels",
+            "Maximum count of shown labels").MaxLabels = 5000
+
         vobj.addProperty(
             "App::PropertyColor", "PointColor", "Point Style",
             "Color of the point group").PointColor = (r, g, b)
@@ -93,10 +103,20 @@ class ViewProviderCluster:
         highlight.addChild(points)
         highlight.addChild(self.markers)
 
-        # Point labels features.
+        # Point labels features, all labels share one font.
         color =coin.SoBaseColor()
+        font = coin.SoFont()
+        font.size = 1000
         self.point_labels = coin.SoSeparator()
         self.point_labels.addChild(color)
+        self.point_labels.addChild(font)
+        self.label_tiles = coin.SoGroup()
+        self.point_labels.addChild(self.label_tiles)
+
+        self.vobj = vobj
+        self.labels = None
+        self.camera = None
+        self.camera_sensor = coin.SoNodeSensor(self.camera_changed, None)
 
         # Point group root.
         point_root = coin.SoSeparator()
@@ -116,38 +136,9 @@ class ViewProviderCluster:
         '''
         Update Object visuals when a view property changed.
         '''
-        labels = vobj.getPropertyByName("Labels")
-        self.point_labels.removeAllChildren()
-        if labels:
-            if prop == "Labels" or prop == "Name" or prop == "NortingEasting"\
-                or prop == "Elevation" or prop == "Description":
-                origin = get_georigin.get()
-
-                show_name = vobj.getPropertyByName("Name")
-                show_ne = vobj.getPropertyByName("NortingEasting")
-                show_z = vobj.getPropertyByName("Elevation")
-                show_des = vobj.getPropertyByName("Description")
-
-                for vector in vobj.Object.Points:
-                    font = coin.SoFont()
-                    font.size = 1000
-                    point_label = coin.SoSeparator()
-                    location = coin.SoTranslation()
-                    text = coin.SoAsciiText()
-                    index = vobj.Object.Points.index(vector)
-                    labels =[]
-
-                    if show_name: labels.append(vobj.Object.PointNames[index])
-                    if show_ne: labels.extend([str(round(vector.x/1000, 3)), str(round(vector.y/1000,3))])
-                    if show_z: labels.append(str(round(vector.z/1000,3)))
-                    if show_des and vobj.Object.Descriptions: labels.append(vobj.Object.Descriptions[index])
-
-                    location.translation = vector.sub(FreeCAD.Vector(origin.Origin))
-                    text.string.setValues(labels)
-                    point_label.addChild(font)
-                    point_label.addChild(location)
-                    point_label.addChild(text)
-                    self.point_labels.addChild(point_label)
+        if prop in ["Labels", "Name", "NortingEasting", "Elevation",
+            "Description", "LabelDistance", "MaxLabels"]:
+            self.update_labels(vobj)
 
         if prop == "PointSize":
             size = vobj.getPropertyByName(prop)
@@ -165,20 +156,148 @@ class ViewProviderCluster:
             points = obj.getPropertyByName(prop)
             if points.Points:
                 origin = get_georigin.get()
-
-                pts = []
-                for i in points.Points:
-                    point = copy.deepcopy(i)
-                    pts.append(point.add(origin.Origin))
+                pts = tin_functions.vectors_to_array(points.Points)
+                pts += numpy.array(tuple(origin.Origin))
 
                 geo_system = ["UTM", origin.UtmZone, "FLAT"]
                 self.geo_coords.geoSystem.setValues(geo_system)
-                self.geo_coords.point.values = pts
+                self.geo_coords.point.setNum(len(pts))
+                self.geo_coords.point.setValues(0, len(pts), pts.tolist())
+
+            if obj.ViewObject and obj.ViewObject.Labels:
+                self.update_labels(obj.ViewObject)
 
         if prop == "Marker":
             marker = obj.getPropertyByName(prop)
             self.markers.markerIndex = marker_dict[marker]
 
+    def update_labels(self, vobj):
+        """
+        Create label texts of all points in one pass and group them
+        by tiles, tile nodes are created when they are shown.
+        """
+        self.label_tiles.removeAllChildren()
+        self.labels = None
+        if not vobj.Labels or not vobj.Object.Points.Points:
+            self.camera_sensor.detach()
+            return
+
+        origin = get_georigin.get()
+        table = vobj.Object.Proxy.table
+        points = tin_functions.vectors_to_array(vobj.Object.Points.Points)
+
+        # Text columns of labels
+        columns = []
+        if vobj.Name: columns.append(table.names.tolist())
+        if vobj.NortingEasting:
+            columns.append([str(i) for i in numpy.round(points[:, 0] / 1000, 3).tolist()])
+            columns.append([str(i) for i in numpy.round(points[:, 1] / 1000, 3).tolist()])
+        if vobj.Elevation:
+            columns.append([str(i) for i in numpy.round(points[:, 2] / 1000, 3).tolist()])
+        if vobj.Description: columns.append(table.descriptions().tolist())
+        if not columns:
+            self.camera_sensor.detach()
+            return
+        texts = list(zip(*columns))
+
+        # Group label rows by square tiles
+        positions = points - numpy.array(tuple(origin.Origin))
+        extent = numpy.ptp(positions[:, :2], axis=0).max()
+        size = max(extent / 32, 1.0)
+        cells = numpy.floor((positions[:, :2] - positions[:, :2].min(axis=0)) / size)
+        keys, inverse = numpy.unique(cells, axis=0, return_inverse=True)
+        order = numpy.argsort(inverse.ravel(), kind='stable')
+        bounds = numpy.cumsum(numpy.bincount(inverse.ravel(), minlength=len(keys)))
+
+        tiles = numpy.split(order, bounds[:-1])
+        centers = numpy.array([positions[i].mean(axis=0) for i in tiles])
+        self.labels = texts, positions, tiles, centers, {}
+
+        self.watch_camera()
+        self.show_labels(vobj)
+
+    def tile_node(self, tile):
+        """
+        Create a separator of labels in a tile, label positions are
+        chained by relative translations.
+        """
+        texts, positions, tiles, centers, nodes = self.labels
+        if tile in nodes: return nodes[tile]
+
+        node = coin.SoSeparator()
+        previous = numpy.zeros(3)
+        for row in tiles[tile].tolist():
+            location = coin.SoTranslation()
+            location.translation = (positions[row] - previous).tolist()
+            text = coin.SoAsciiText()
+            text.string.setValues(0, len(texts[row]), list(texts[row]))
+            node.addChild(location)
+            node.addChild(text)
+            previous = positions[row]
+
+        nodes[tile] = node
+        return node
+
+    def show_labels(self, vobj):
+        """
+        Show label tiles in camera view and within label distance,
+        nearest tiles first up to maximum label count.
+        """
+        if self.labels is None: return
+        texts, positions, tiles, centers, nodes = self.labels
+
+        shown = numpy.arange(len(tiles))
+        if self.camera is not None:
+            # Tiles projected out of screen are culled
+            volume = self.camera.getViewVolume()
+            screen = numpy.array([volume.projectToScreen(
+                coin.SbVec3f(*i)).getValue() for i in centers.tolist()])
+            visible = numpy.all((screen[:, :2] >= -0.25) & (screen[:, :2] <= 1.25)
+                & (screen[:, 2:] >= 0) & (screen[:, 2:] <= 1), axis=1)
+
+            # Orthographic zoom changes view height, not camera position
+            if self.camera.isOfType(coin.SoOrthographicCamera.getClassTypeId()):
+                distances = numpy.full(len(tiles), self.camera.height.getValue())
+                order = numpy.linalg.norm(screen[:, :2] - 0.5, axis=1)
+            else:
+                position = numpy.array(self.camera.position.getValue().getValue())
+                distances = numpy.linalg.norm(centers - position, axis=1)
+                order = distances
+
+            shown = numpy.argsort(order, kind='stable')
+            shown = shown[visible[shown]]
+
+            limit = getattr(vobj, "LabelDistance", None)
+            if limit and limit.Value > 0:
+                shown = shown[distances[shown] <= limit.Value]
+
+        # Nearest tiles up to maximum label count
+        count = numpy.cumsum([len(tiles[i]) for i in shown.tolist()])
+        shown = shown[count <= getattr(vobj, "MaxLabels", 5000)]
+
+        self.label_tiles.removeAllChildren()
+        for tile in shown.tolist():
+            self.label_tiles.addChild(self.tile_node(tile))
+
+    def watch_camera(self):
+        """
+        Follow camera of active view to update shown labels.
+        """
+        view = FreeCADGui.ActiveDocument.ActiveView if FreeCADGui.ActiveDocument else None
+        if not hasattr(view, "getCameraNode"): return
+
+        camera = view.getCameraNode()
+        if camera is not self.camera:
+            self.camera_sensor.detach()
+            self.camera = camera
+            self.camera_sensor.attach(camera)
+
+    def camera_changed(self, data, sensor):
+        """
+        Update shown labels after camera moves.
+        """
+        self.show_labels(self.vobj)
+
     def getDisplayModes(self, vobj):
         '''
         Return a list of display modes.
@@ -25,6 +25,7 @@
 import FreeCAD
 from pivy import coin
 import random
+import numpy
 
 from trails_variables import icons_path, line_patterns
 from ..functions import terrain_functions
@@ -322,19 +323,29 @@ class ViewProviderTerrain(terrain_functions.ViewFunctions):
         self.minor_coords.geoSystem.setValues(geo_system)
 
         if prop == "Mesh":
-            mesh = obj.getPropertyByName("Mesh")
-            copy_mesh = mesh.copy()
-            copy_mesh.Placement.move(origin.Origin)
+            # Local edits only patch changed faces
+            delta = getattr(obj.Proxy, "edit_delta", None)
+            if delta is not None:
+                self.patch_faces(delta, obj.Proxy.session, origin.Origin)
 
-            triangles = []
-            for i in copy_mesh.Topology[1]:
-                triangles.extend(list(i))
-                triangles.append(-1)
+            else:
+                mesh = obj.getPropertyByName("Mesh")
+                copy_mesh = mesh.copy()
+                copy_mesh.Placement.move(origin.Origin)
 
-            self.geo_coords.point.values = copy_mesh.Topology[0]
-            self.triangles.coordIndex.values = triangles
+                triangles = []
+                for i in copy_mesh.Topology[1]:
+                    triangles.extend(list(i))
+                    triangles.append(-1)
 
-            del copy_mesh
+                self.geo_coords.point.values = copy_mesh.Topology[0]
+                self.triangles.coordIndex.values = triangles
+
+                del copy_mesh
+
+            # Recolor analysis for new facets
+            if obj.getPropertyByName("AnalysisType") != "Default":
+                self.updateData(obj, "AnalysisType")
 
         if prop == "ContourShapes":
             contour_shape = obj.getPropertyByName(prop)
@@ -369,21 +380,39 @@ class ViewProviderTerrain(terrain_functions.ViewFunctions):
                     self.face_material.diffuseColor = material.DiffuseColor[:3]
                     self.mat_binding.value = coin.SoMaterialBinding.OVERALL
 
-            if analysis_type == "Elevation":
-                colorlist = self.elevation_analysis(obj.Mesh, ranges)
-                self.mat_binding.value = coin.SoMaterialBinding.PER_FACE
-                self.face_material.diffuseColor.setValues(0,len(colorlist),colorlist)
-
-            elif analysis_type == "Slope":
-                colorlist = self.slope_analysis(obj.Mesh, ranges)
-                self.mat_binding.value = coin.SoMaterialBinding.PER_FACE
-                self.face_material.diffuseColor.setValues(0,len(colorlist),colorlist)
-
-            elif analysis_type == "Direction":
-                colorlist = self.direction_analysis(obj.Mesh, ranges)
+            else:
+                colorlist = self.analysis_colors(obj, analysis_type, ranges)
                 self.mat_binding.value = coin.SoMaterialBinding.PER_FACE
                 self.face_material.diffuseColor.setValues(0,len(colorlist),colorlist)
         
+    def patch_faces(self, delta, session, base):
+        """
+        Apply an edit delta to face set, removed faces are deleted and
+        added faces are appended like session rows.
+        """
+        # Points are appended or trimmed at the end
+        count = len(session.points)
+        self.geo_coords.point.setNum(count)
+        if len(delta.points):
+            start = count - len(delta.points)
+            points = delta.points + numpy.array(tuple(base))
+            self.geo_coords.point.setValues(start, len(points), points.tolist())
+
+        index = self.triangles.coordIndex
+        if len(delta.rows) > 64:
+            faces = numpy.hstack((session.triangles,
+                numpy.full((len(session.triangles), 1), -1))).ravel().tolist()
+            index.setNum(len(faces))
+            index.setValues(0, len(faces), faces)
+            return
+
+        for row in sorted(delta.rows.tolist(), reverse=True):
+            index.deleteValues(row * 4, 4)
+
+        faces = numpy.hstack((delta.added,
+            numpy.full((len(delta.added), 1), -1))).ravel().tolist()
+        if faces: index.setValues(index.getNum(), len(faces), faces)
+
     def getDisplayModes(self,vobj):
         '''
         Return a list of display modes.
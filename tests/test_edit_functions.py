@@ -0,0 +1,56 @@
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2021 Hakan Seven <hakanseven12@gmail.com>               *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""Tests for local Terrain edits."""
+
+import numpy
+
+from Trails.functions.edit_functions import EditSession, boundary_touched
+
+
+def square():
+    points = numpy.array([[0, 0, 0], [10, 0, 1], [10, 10, 2], [0, 10, 3]], dtype=float)
+    triangles = numpy.array([[0, 1, 2], [0, 2, 3]], dtype=numpy.int32)
+    return EditSession(points, triangles)
+
+
+def test_add_point_undo_redo():
+    session = square()
+    points, triangles = session.points.copy(), session.triangles.copy()
+
+    delta = session.add_point(0, [7, 3, 5])
+    assert len(session.points) == 5 and len(session.triangles) == 4
+    assert session.touched(delta)[:, 2].max() == 5
+
+    # Undo trims the added point, removed triangles still refer to it
+    delta = session.undo()
+    touched = session.touched(delta)
+    assert touched[:, 2].max() == 5
+    boundary_touched(session.triangles, delta)
+    numpy.testing.assert_array_equal(session.points, points)
+    numpy.testing.assert_array_equal(
+        numpy.sort(session.triangles, axis=0), numpy.sort(triangles, axis=0))
+
+    delta = session.redo()
+    assert session.touched(delta)[:, 2].max() == 5
+    numpy.testing.assert_array_equal(session.points[4], [7, 3, 5])
+    assert len(session.triangles) == 4